@@ -0,0 +1,42 @@
+import re
+from typing import Dict, Union
+
+from django.conf import settings
+from django.db.backends.sqlite3 import base
+
+PRAGMA_NAME_PATTERN = re.compile(r"^\w+$")
+
+
+def apply_pragmas(connection, pragmas: Dict[str, Union[str, int]]) -> None:
+    """Apply the SQLite pragmas to a DB-API connection."""
+    for name, value in pragmas.items():
+        if not PRAGMA_NAME_PATTERN.match(name) or not PRAGMA_NAME_PATTERN.match(
+            str(value).lstrip("-")
+        ):
+            raise ValueError(f"Invalid SQLite pragma: {name} = {value}")
+        connection.execute(f"PRAGMA {name} = {value}")
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    SQLite backend that applies the SQLITE_PRAGMAS setting to every new
+    connection and starts transactions in the SQLITE_TRANSACTION_MODE.
+    """
+
+    def get_new_connection(self, conn_params):
+        """Open a connection and apply the configured pragmas to it."""
+        connection = super().get_new_connection(conn_params)
+        apply_pragmas(connection, getattr(settings, "SQLITE_PRAGMAS", {}))
+        return connection
+
+    def _start_transaction_under_autocommit(self):
+        """
+        Start a transaction in the configured mode. IMMEDIATE transactions take
+        the write lock when they start, so they wait for the busy timeout
+        instead of failing when a read lock cannot be upgraded.
+        """
+        transaction_mode = getattr(settings, "SQLITE_TRANSACTION_MODE", None)
+        if transaction_mode is None:
+            super()._start_transaction_under_autocommit()
+        else:
+            self.cursor().execute(f"BEGIN {transaction_mode}")
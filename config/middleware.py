@@ -0,0 +1,56 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from config.routers import has_written, primary_pinning
+
+PRIMARY_COOKIE = "use_primary"
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+
+class ReplicaPinningMiddleware:
+    """
+    Pin the requests of a client to the primary database while the replicas
+    may lag behind its writes. Unsafe requests and requests with the pinning
+    cookie read from the primary, and requests that write set the cookie for
+    DATABASE_REPLICA_LAG seconds.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response) -> None:
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with primary_pinning(self.use_primary(request)):
+            response = self.get_response(request)
+            self.pin_client(response)
+        return response
+
+    async def __acall__(self, request):
+        """Handle the request like __call__ under ASGI."""
+        with primary_pinning(self.use_primary(request)):
+            response = await self.get_response(request)
+            self.pin_client(response)
+        return response
+
+    @staticmethod
+    def use_primary(request) -> bool:
+        """Check whether the request has to read from the primary database."""
+        return request.method not in SAFE_METHODS or PRIMARY_COOKIE in request.COOKIES
+
+    @staticmethod
+    def pin_client(response) -> None:
+        """Set the pinning cookie if the request has written to the database."""
+        if settings.DATABASE_REPLICAS and has_written():
+            response.set_cookie(
+                PRIMARY_COOKIE,
+                "1",
+                max_age=settings.DATABASE_REPLICA_LAG,
+                httponly=True,
+                samesite="Lax",
+            )
@@ -0,0 +1,70 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+REPLICA_APP_LABELS = {"products"}
+PRIMARY_ONLY_MODELS = {"products.basketitem"}
+
+_use_primary = ContextVar("use_primary", default=False)
+_has_written = ContextVar("has_written", default=False)
+
+
+@contextmanager
+def primary_pinning(use_primary: bool) -> Iterator[None]:
+    """
+    Route the reads of the block to the primary database if use_primary is
+    set, and otherwise once the block has written.
+    """
+    use_primary_token = _use_primary.set(use_primary)
+    has_written_token = _has_written.set(False)
+    try:
+        yield
+    finally:
+        _use_primary.reset(use_primary_token)
+        _has_written.reset(has_written_token)
+
+
+def has_written() -> bool:
+    """Check whether the current request or command has written to the database."""
+    return _has_written.get()
+
+
+class ReplicaRouter:
+    """
+    Database router that sends reads of catalog models to a random read
+    replica from the DATABASE_REPLICAS setting and everything else to the
+    primary. Reads in transactions, and reads after the current request or
+    command has written, go to the primary, so that they see the writes.
+    """
+
+    def db_for_read(self, model, **hints) -> Optional[str]:
+        """Get the database to read the model from."""
+        if (
+            not settings.DATABASE_REPLICAS
+            or model._meta.app_label not in REPLICA_APP_LABELS
+            or model._meta.label_lower in PRIMARY_ONLY_MODELS
+            or _use_primary.get()
+            or _has_written.get()
+            or connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return DEFAULT_DB_ALIAS
+        return random.choice(settings.DATABASE_REPLICAS)
+
+    def db_for_write(self, model, **hints) -> Optional[str]:
+        """Get the database to write the model to, which is always the primary."""
+        _has_written.set(True)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints) -> Optional[bool]:
+        """Allow relations between objects of any database, as they hold the same data."""
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints) -> Optional[bool]:
+        """Migrate only the primary, the replicas copy its schema."""
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -53,6 +54,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    "config.middleware.ReplicaPinningMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -84,13 +86,101 @@ WSGI_APPLICATION = "config.wsgi.application"
 
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
+# SQLite is used by default. PostgreSQL, which allows parallel writers, is
+# selected with DATABASE_ENGINE=postgresql and configured with the POSTGRES_*
+# variables. Connections are kept open for DATABASE_CONN_MAX_AGE seconds and
+# checked before they are reused.
 
-DATABASES = {
-    "default": {
-        "ENGINE": "django.db.backends.sqlite3",
+DATABASE_CONN_MAX_AGE = int(os.environ.get("DATABASE_CONN_MAX_AGE", 60))
+
+DATABASE_ENGINES = {
+    "sqlite": {
+        "ENGINE": "config.backends.sqlite3",
         "NAME": DATABASE_DIR / "db.sqlite3",
-    }
+        "CONN_MAX_AGE": DATABASE_CONN_MAX_AGE,
+        "CONN_HEALTH_CHECKS": True,
+        # A file rather than memory, so that the threads of the concurrency
+        # tests share the test database.
+        "TEST": {"NAME": DATABASE_DIR / "test.sqlite3"},
+    },
+    "postgresql": {
+        "ENGINE": "django.db.backends.postgresql",
+        "NAME": os.environ.get("POSTGRES_DB", "megano"),
+        "USER": os.environ.get("POSTGRES_USER", "megano"),
+        "PASSWORD": os.environ.get("POSTGRES_PASSWORD", ""),
+        "HOST": os.environ.get("POSTGRES_HOST", "localhost"),
+        "PORT": os.environ.get("POSTGRES_PORT", "5432"),
+        "CONN_MAX_AGE": DATABASE_CONN_MAX_AGE,
+        "CONN_HEALTH_CHECKS": True,
+    },
+}
+
+DATABASES = {"default": DATABASE_ENGINES[os.environ.get("DATABASE_ENGINE", "sqlite")]}
+
+# Read replicas of the default database, separated by commas in
+# DATABASE_REPLICAS: file names in the db directory for SQLite, and database
+# names with an optional "host[:port]/" prefix for PostgreSQL. Catalog reads
+# are routed to the replicas, and clients that write read from the primary for
+# DATABASE_REPLICA_LAG seconds afterwards. Tests use the primary for all of them.
+
+DATABASE_REPLICAS = []
+
+for number, replica in enumerate(
+    filter(None, os.environ.get("DATABASE_REPLICAS", "").split(",")), start=1
+):
+    replica_settings = {**DATABASES["default"], "TEST": {"MIRROR": "default"}}
+    if replica_settings["ENGINE"] == "config.backends.sqlite3":
+        replica_settings["NAME"] = DATABASE_DIR / replica.strip()
+    else:
+        address, _, replica_settings["NAME"] = replica.strip().rpartition("/")
+        if address:
+            replica_settings["HOST"], _, port = address.partition(":")
+            replica_settings["PORT"] = port or replica_settings["PORT"]
+    DATABASES[f"replica_{number}"] = replica_settings
+    DATABASE_REPLICAS.append(f"replica_{number}")
+
+DATABASE_ROUTERS = ["config.routers.ReplicaRouter"]
+DATABASE_REPLICA_LAG = int(os.environ.get("DATABASE_REPLICA_LAG", 5))
+
+# Applied to every SQLite connection. WAL lets readers work while a writer
+# commits, and writers wait for each other for up to busy_timeout milliseconds.
+SQLITE_PRAGMAS = {
+    "journal_mode": "wal",
+    "busy_timeout": 5000,
+    "synchronous": "normal",
+    "mmap_size": 256 * 1024 * 1024,
+    "cache_size": -64 * 1024,
+    "temp_store": "memory",
 }
+SQLITE_TRANSACTION_MODE = "IMMEDIATE"
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# The local-memory cache is private to each process, so deployments running
+# several worker processes should use the file-based cache: CACHE_BACKEND=file
+
+CACHE_BACKENDS = {
+    "locmem": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "megano",
+        "OPTIONS": {"MAX_ENTRIES": 10000},
+    },
+    "file": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": DATABASE_DIR / "cache",
+        "OPTIONS": {"MAX_ENTRIES": 10000},
+    },
+}
+
+CACHES = {"default": CACHE_BACKENDS[os.environ.get("CACHE_BACKEND", "locmem")]}
+
+
+# Shopping baskets
+# Either products.baskets.DatabaseBasketStore or products.baskets.CacheBasketStore,
+# which needs a cache with an atomic add and does not work with CACHE_BACKEND=file
+
+BASKET_STORE = os.environ.get("BASKET_STORE", "products.baskets.DatabaseBasketStore")
 
 
 # Password validation
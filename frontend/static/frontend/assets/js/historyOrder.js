@@ -1,10 +1,10 @@
 var mix = {
 	methods: {
 		getHistoryOrder() {
-			this.getData("/api/orders/")
+			this.getData(this.ordersNext || "/api/orders/")
 				.then(data => {
-					console.log(data)
-					this.orders = data
+					this.orders = this.ordersNext ? [...this.orders, ...data.items] : data.items
+					this.ordersNext = data.next
 				}).catch(() => {
 				this.orders = []
 				console.warn('Ошибка при получении списка заказов')
@@ -17,6 +17,7 @@ var mix = {
 	data() {
 		return {
 			orders: [],
+			ordersNext: null,
 		}
 	}
 }
\ No newline at end of file
@@ -1,43 +1,22 @@
 var mix = {
 	methods: {
-		getBanners() {
-			this.getData("/api/banners/")
+		getHomeFeed() {
+			this.getData("/api/home/")
 				.then(data => {
-					this.banners = data
+					this.banners = data.banners
+					this.popularCards = data.popular
+					this.limitedCards = data.limited
 				}).catch(() => {
 				this.banners = []
-				console.warn('Ошибка при получении баннеров')
-			})
-		},
-		getPopularProducts() {
-			this.getData("/api/products/popular/")
-				.then(data => {
-					this.popularCards = data
-				})
-				.catch((error) => {
-					console.log('----', error)
-					this.popularCards = []
-					console.warn('Ошибка при получении списка популярных товаров')
-				})
-		},
-		getLimitedProducts() {
-			this.getData("/api/products/limited/")
-				.then(data => {
-					this.limitedCards = data
-				}).catch(() => {
+				this.popularCards = []
 				this.limitedCards = []
-				console.warn('Ошибка при получении списка лимитированных товаров')
+				console.warn('Ошибка при получении данных главной страницы')
 			})
 		},
 	},
 	mounted() {
-		this.getBanners();
-		this.getPopularProducts();
-		this.getLimitedProducts();
+		this.getHomeFeed();
 	},
-   created() {
-     this.getLimitedProducts()
-   },
 	data() {
 		return {
 			banners: [],
@@ -45,4 +24,4 @@ var mix = {
 			limitedCards: [],
 		}
 	}
-}
\ No newline at end of file
+}
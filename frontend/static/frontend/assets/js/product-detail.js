@@ -34,7 +34,9 @@ var mix = {
                 text: this.review.text,
                 rate: this.review.rate
             }).then(({data}) => {
-                this.product.reviews = data
+                this.product.reviews = [data.review, ...(this.product.reviews || [])]
+                this.product.rating = data.rating
+                this.product.reviews_count = data.reviews_count
                 alert('Отзыв опубликован')
                 this.review.author = ''
                 this.review.email = ''
@@ -44,6 +46,17 @@ var mix = {
                 console.warn('Ошибка при публикации отзыва')
             })
         },
+        getMoreReviews() {
+            const url = this.reviewsNext || `/api/products/${this.product.id}/reviews/`
+            this.getData(url).then(data => {
+                this.product.reviews = this.reviewsNext
+                    ? [...this.product.reviews, ...data.items]
+                    : data.items
+                this.reviewsNext = data.next
+            }).catch(() => {
+                console.warn('Ошибка при получении отзывов')
+            })
+        },
         setActivePhoto(index) {
             this.activePhoto = index
         }
@@ -56,6 +69,7 @@ var mix = {
             product : {},
             activePhoto: 0,
             count: 1,
+            reviewsNext: null,
             review: {
                 author: '',
                 email: '',
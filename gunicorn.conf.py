@@ -0,0 +1,41 @@
+"""
+Gunicorn settings. By default the WSGI application is served by sync
+workers, and with SERVER_MODE=asgi the ASGI application is served by
+uvicorn workers, which handle many slow clients and async views at once.
+"""
+import os
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(os.environ.get("GUNICORN_WORKERS", 1))
+
+if os.environ.get("SERVER_MODE") == "asgi":
+    wsgi_app = "config.asgi:application"
+    worker_class = "uvicorn.workers.UvicornWorker"
+    # Django runs the sync code of every ASGI request in a new thread, so
+    # persistent connections would never be reused and are closed instead.
+    os.environ.setdefault("DATABASE_CONN_MAX_AGE", "0")
+else:
+    wsgi_app = "config.wsgi:application"
+
+
+def on_starting(server) -> None:
+    """
+    Refuse to start several workers with a cache that is private to each of
+    them, or with a basket store that cannot work with the cache.
+    """
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+    import django
+    from django.conf import settings
+    from django.core.management import call_command
+
+    backend = settings.CACHES["default"]["BACKEND"]
+    if server.cfg.workers > 1 and backend.endswith("LocMemCache"):
+        # The catalog version lives in the cache, so every worker would keep
+        # its own version and serve outdated responses after changes.
+        raise RuntimeError(
+            "Several workers need a shared cache, set CACHE_BACKEND=file "
+            "or run a single worker."
+        )
+
+    django.setup()
+    call_command("check", tags=["caches"])
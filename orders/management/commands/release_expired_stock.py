@@ -0,0 +1,14 @@
+from typing import Any, Optional
+
+from django.core.management import BaseCommand
+
+from orders.reservations import release_expired_stock
+
+
+class Command(BaseCommand):
+    help = "Return the stock of expired reservations and cancel their unpaid orders"
+
+    def handle(self, *args: Any, **options: Any) -> Optional[str]:
+        """Release the stock of expired reservations."""
+        canceled = release_expired_stock()
+        return f"{canceled} orders with expired reservations have been canceled."
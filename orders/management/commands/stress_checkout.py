@@ -0,0 +1,141 @@
+import random
+import threading
+import time
+from collections import Counter
+from datetime import timedelta
+from typing import Any, Optional
+from uuid import uuid4
+
+from django.contrib.auth.models import User
+from django.core.management import BaseCommand, CommandError
+from django.db import OperationalError, connection, transaction
+from django.db.models import Sum
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from orders.models import Order, OrderProduct, StockReservation
+from orders.reservations import commit_stock, release_expired_stock
+from orders.services import change_total_cost
+from products.models import Product
+from profiles.models import Profile
+
+
+class Command(BaseCommand):
+    help = (
+        "Place orders for a product with limited stock from parallel threads, "
+        "check that the stock is never oversold and report checkouts per second"
+    )
+
+    def add_arguments(self, parser) -> None:
+        """Add the options of the stress test."""
+        parser.add_argument("--threads", type=int, default=8)
+        parser.add_argument("--checkouts", type=int, default=50, help="per thread")
+        parser.add_argument("--stock", type=int, default=200)
+        parser.add_argument("--max-count", type=int, default=3, help="per order")
+        parser.add_argument(
+            "--pay-ratio",
+            type=float,
+            default=0.5,
+            help="share of orders that are paid, the others expire",
+        )
+
+    def handle(self, *args: Any, **options: Any) -> Optional[str]:
+        """Run the stress test on a temporary product and user and remove them."""
+        suffix = uuid4().hex[:8]
+        user = User.objects.create_user(username=f"stress-checkout-{suffix}")
+        profile = Profile.objects.create(user=user, fullName="Stress Checkout")
+        product = Product.objects.create(
+            title=f"Stress checkout {suffix}", price=1, count=options["stock"]
+        )
+        try:
+            return self.run(profile, product, options)
+        finally:
+            Order.objects.filter(profile=profile).delete()
+            product.delete()
+            avatar = profile.avatar
+            user.delete()
+            avatar.delete()
+
+    def run(self, profile, product, options) -> str:
+        """Run the checkouts in parallel threads and check the stock afterwards."""
+        results = Counter()
+        results_lock = threading.Lock()
+
+        def checkout_worker() -> None:
+            try:
+                for _ in range(options["checkouts"]):
+                    result = self.checkout(
+                        profile, product, random.randint(1, options["max_count"])
+                    )
+                    with results_lock:
+                        results[result] += 1
+            finally:
+                connection.close()
+
+        threads = [
+            threading.Thread(target=checkout_worker) for _ in range(options["threads"])
+        ]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        self.check_stock(product, options["stock"])
+
+        orders = list(
+            Order.objects.filter(profile=profile, reservations__isnull=False).distinct()
+        )
+        for order in orders:
+            if random.random() < options["pay_ratio"]:
+                commit_stock(order)
+                Order.objects.filter(pk=order.pk).update(status="accepted")
+        release_expired_stock(now=timezone.now() + timedelta(days=1))
+        self.check_stock(product, options["stock"])
+
+        attempts = sum(results.values())
+        self.stdout.write(
+            f"{attempts} checkouts in {elapsed:.2f}s, {attempts / elapsed:.1f}/s: "
+            f"{results['placed']} placed, {results['out_of_stock']} out of stock, "
+            f"{results['locked']} failed on database locks"
+        )
+        return "No stock was oversold."
+
+    @staticmethod
+    def checkout(profile, product, count) -> str:
+        """Place an order for the product as the checkout API does."""
+        try:
+            with transaction.atomic():
+                order = Order.objects.create(profile=profile)
+                OrderProduct.objects.bulk_create(
+                    [OrderProduct(order=order, product=product, count=count)]
+                )
+                change_total_cost(order)
+        except ValidationError:
+            return "out_of_stock"
+        except OperationalError:
+            return "locked"
+        return "placed"
+
+    @staticmethod
+    def check_stock(product, initial_stock) -> None:
+        """Check that no stock has been oversold or lost."""
+        stock = Product.objects.values_list("count", flat=True).get(pk=product.pk)
+        reserved = (
+            StockReservation.objects.filter(product=product).aggregate(
+                total=Sum("count")
+            )["total"]
+            or 0
+        )
+        sold = (
+            OrderProduct.objects.filter(product=product)
+            .exclude(order__status="canceled")
+            .aggregate(total=Sum("count"))["total"]
+            or 0
+        )
+        if sold != initial_stock - stock or reserved > sold:
+            raise CommandError(
+                f"Stock mismatch: {initial_stock} initial, {stock} left, "
+                f"{sold} in live orders, {reserved} reserved."
+            )
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.3 on 2026-10-18 19:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("orders", "0002_stock_reservation"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="order",
+            index=models.Index(
+                fields=["profile", "-createdAt"], name="orders_profile_date_idx"
+            ),
+        ),
+    ]
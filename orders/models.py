@@ -18,6 +18,11 @@ class Order(models.Model):
 
     class Meta:
         db_table = "orders"
+        indexes = (
+            models.Index(
+                fields=("profile", "-createdAt"), name="orders_profile_date_idx"
+            ),
+        )
 
     def __str__(self):
         """String representation of the order."""
@@ -36,15 +41,20 @@ class OrderProduct(models.Model):
     class Meta:
         db_table = "orders_order_products"
 
-    def save(
-        self,
-        force_insert=False,
-        force_update=False,
-        using=None,
-        update_fields=None,
-    ) -> None:
-        """Custom save method for OrderProduct to check product stock availability before saving."""
-        product = self.product
-        if product.count < self.count:
-            raise Exception(f"Not enough stock for product {product.pk}.")
-        super().save(force_insert, force_update, using, update_fields)
+
+class StockReservation(models.Model):
+    """Model representing stock of a product held for an order until it is paid."""
+
+    order = models.ForeignKey(
+        Order, on_delete=models.CASCADE, related_name="reservations"
+    )
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="+")
+    count = models.PositiveIntegerField()
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        db_table = "orders_stock_reservations"
+
+    def __str__(self):
+        """String representation of the stock reservation."""
+        return f"{self.count} x {self.product_id} for order #{self.order_id}"
@@ -0,0 +1,21 @@
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
+
+
+class OrderPagination(CursorPagination):
+    """Cursor pagination for the order history, from the latest order."""
+
+    page_size_query_param = "limit"
+    page_size = 20
+    max_page_size = 100
+    ordering = ("-createdAt", "-id")
+
+    def get_paginated_response(self, data) -> Response:
+        """Get the paginated response with the links to the neighbouring pages."""
+        return Response(
+            {
+                "items": data,
+                "next": self.get_next_link(),
+                "previous": self.get_previous_link(),
+            }
+        )
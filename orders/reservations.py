@@ -0,0 +1,99 @@
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from django.db import transaction
+from django.utils import timezone
+
+from orders.models import Order, StockReservation
+from products.services import decrease_products_count, increase_products_count
+
+RESERVATION_TIMEOUT = timedelta(minutes=15)
+ORDER_CANCELED = "canceled"
+
+
+def reserve_stock(
+    order: Order, product_counts: Dict[int, int], timeout=RESERVATION_TIMEOUT
+) -> List[int]:
+    """
+    Take the counts of products from the stock and hold them for the order
+    until it is paid or the reservation expires. The stock is taken with a
+    single conditional UPDATE, so parallel checkouts never oversell. If some
+    products do not have enough stock, nothing is reserved and their ids are
+    returned.
+
+    Expired reservations of the products are released first, so their stock
+    can be taken again without waiting for the release_expired_stock command.
+    """
+    release_expired_stock(product_ids=list(product_counts))
+    with transaction.atomic():
+        missing_product_ids = decrease_products_count(product_counts)
+        if missing_product_ids:
+            return missing_product_ids
+
+        expires_at = timezone.now() + timeout
+        StockReservation.objects.bulk_create(
+            StockReservation(
+                order=order, product_id=product_id, count=count, expires_at=expires_at
+            )
+            for product_id, count in product_counts.items()
+        )
+    return []
+
+
+def commit_stock(order: Order) -> bool:
+    """
+    Make the stock reserved for the order permanent. Return False if the
+    reservation has expired, whether or not its stock has been returned yet.
+    """
+    deleted, _ = StockReservation.objects.filter(
+        order=order, expires_at__gt=timezone.now()
+    ).delete()
+    if deleted:
+        return True
+    # Expired reservations are left to release_expired_stock, which returns
+    # their stock.
+    if StockReservation.objects.filter(order=order).exists():
+        return False
+    return not Order.objects.filter(pk=order.pk, status=ORDER_CANCELED).exists()
+
+
+def release_stock(order: Order) -> bool:
+    """
+    Return the stock reserved for the order and cancel the order. Return False
+    if the order has no reservation left, because it has been committed or
+    released by a parallel request.
+    """
+    with transaction.atomic():
+        product_counts = Counter()
+        for product_id, count in StockReservation.objects.filter(order=order).values_list(
+            "product_id", "count"
+        ):
+            product_counts[product_id] += count
+
+        # The reservations of an order are deleted by a single statement, so
+        # only one of parallel commits and releases sees them.
+        deleted, _ = StockReservation.objects.filter(order=order).delete()
+        if not deleted:
+            return False
+
+        increase_products_count(product_counts)
+        Order.objects.filter(pk=order.pk).update(status=ORDER_CANCELED)
+    return True
+
+
+def release_expired_stock(
+    now: Optional[datetime] = None, product_ids: Optional[List[int]] = None
+) -> int:
+    """
+    Release expired reservations, only those of the given products if they
+    are given, and return the number of canceled orders.
+    """
+    expired = StockReservation.objects.filter(expires_at__lte=now or timezone.now())
+    if product_ids is not None:
+        expired = expired.filter(product_id__in=product_ids)
+    expired_order_ids = expired.values_list("order_id", flat=True).distinct()
+    return sum(
+        release_stock(order)
+        for order in Order.objects.filter(pk__in=list(expired_order_ids))
+    )
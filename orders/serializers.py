@@ -4,12 +4,69 @@ from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
 
 from orders.models import Order, OrderProduct
+from products.models import Product
 from products.serializers import ProductImageSerializer, TagSerializer
 
 
+class OrderProductListSerializer(serializers.ListSerializer):
+    """
+    Serializer for lists of OrderProduct objects, which loads all products
+    with a single query, merges the lines of the same product and inserts
+    the lines with a single query.
+    """
+
+    def to_internal_value(self, data):
+        """Validate the order products, merging the lines of the same product."""
+        if isinstance(data, list):
+            product_ids = set()
+            for item in data:
+                try:
+                    product_ids.add(int(item.get("product")))
+                except (AttributeError, TypeError, ValueError):
+                    pass
+            self._context["products"] = Product.objects.only("id").in_bulk(product_ids)
+
+        merged_lines = {}
+        for line in super().to_internal_value(data):
+            product_id = line["product"].pk
+            if product_id in merged_lines:
+                merged_lines[product_id]["count"] += line["count"]
+            else:
+                merged_lines[product_id] = line
+        return list(merged_lines.values())
+
+    def create(self, validated_data):
+        """Create the order products with a single query."""
+        return OrderProduct.objects.bulk_create(
+            OrderProduct(**attrs) for attrs in validated_data
+        )
+
+
+class PreloadedProductField(serializers.PrimaryKeyRelatedField):
+    """
+    Primary key field for products that looks the product up in the products
+    preloaded into the serializer context, if there are any.
+    """
+
+    def to_internal_value(self, data):
+        """Get the product by its primary key."""
+        products = self.context.get("products")
+        if products is None:
+            return super().to_internal_value(data)
+
+        try:
+            product = products.get(int(data))
+        except (TypeError, ValueError):
+            self.fail("incorrect_type", data_type=type(data).__name__)
+        if product is None:
+            self.fail("does_not_exist", pk_value=data)
+        return product
+
+
 class OrderProductSerializer(serializers.ModelSerializer):
     """Serializer for OrderProduct objects."""
 
+    product = PreloadedProductField(queryset=Product.objects.all(), write_only=True)
     date = serializers.DateTimeField(source="product.date", read_only=True)
     price = serializers.SerializerMethodField()
     category = serializers.PrimaryKeyRelatedField(
@@ -20,9 +77,7 @@ class OrderProductSerializer(serializers.ModelSerializer):
     freeDelivery = serializers.BooleanField(source="product.freeDelivery", read_only=True)
     images = ProductImageSerializer(source="product.images", many=True, read_only=True)
     tags = TagSerializer(source="product.tags", many=True, read_only=True)
-    reviews = serializers.PrimaryKeyRelatedField(
-        source="product.reviews", many=True, read_only=True
-    )
+    reviews = serializers.IntegerField(source="product.reviews_count", read_only=True)
     rating = serializers.DecimalField(
         source="product.rating", max_digits=2, decimal_places=1, read_only=True
     )
@@ -31,18 +86,16 @@ class OrderProductSerializer(serializers.ModelSerializer):
         model = OrderProduct
         exclude = ("order",)
         extra_kwargs = {
-            "product": {"write_only": True},
+            "count": {"min_value": 1},
         }
+        list_serializer_class = OrderProductListSerializer
 
     def get_price(self, obj) -> float:
         """
         Get the price of the associated product. If the product is on sale,
         return the sale price, otherwise, return the regular price.
         """
-        product = obj.product
-        if hasattr(product, "sale"):
-            return product.sale.salePrice
-        return product.price
+        return obj.product.effective_price
 
 
 class OrderSerializer(serializers.ModelSerializer):
@@ -61,6 +114,23 @@ class OrderSerializer(serializers.ModelSerializer):
         }
 
 
+class OrderSummarySerializer(serializers.ModelSerializer):
+    """Serializer for a short representation of Order objects, without products."""
+
+    class Meta:
+        model = Order
+        fields = (
+            "id",
+            "createdAt",
+            "deliveryType",
+            "paymentType",
+            "totalCost",
+            "status",
+            "city",
+            "address",
+        )
+
+
 class PaymentSerializer(serializers.Serializer):
     """Serializer for Payment data."""
 
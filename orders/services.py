@@ -1,28 +1,58 @@
+from collections import Counter
 from typing import Dict, List
 
-from django.db.models import Prefetch
+from django.db.models import DecimalField, F, Prefetch, Sum
+from django.db.models.functions import Coalesce
+from django.db.models.query import QuerySet
+from rest_framework.exceptions import ValidationError
 
-from products.models import ProductSale
-from products.services import change_product_count, get_total_price_product
+from orders.models import Order, OrderProduct
+from orders.reservations import reserve_stock
 
 
-def change_total_cost(order) -> None:
-    """Calculate and update the total cost of an order."""
-    product_sale_prefetch = Prefetch("product__sale", queryset=ProductSale.objects.all())
-    order_products = (
-        order.products.select_related("product")
-        .prefetch_related(product_sale_prefetch)
-        .all()
+def get_order_detail_queryset() -> QuerySet[Order]:
+    """
+    Get a queryset of orders with all relations used by OrderSerializer,
+    so that an order costs a fixed number of queries for any number of products.
+    """
+    return Order.objects.select_related("profile__user").prefetch_related(
+        Prefetch(
+            "products",
+            queryset=OrderProduct.objects.select_related("product").prefetch_related(
+                "product__images", "product__tags"
+            ),
+        )
     )
-    total_cost = 0
 
-    for order_product in order_products:
-        product = order_product.product
-        change_product_count(product, order_product.count)
-        total_cost += get_total_price_product(product, order_product.count)
 
-    order.totalCost = total_cost
-    order.save()
+def change_total_cost(order) -> None:
+    """
+    Reserve the stock of the products of an order and calculate its total
+    cost, with a fixed number of queries for any number of order products.
+    """
+    product_counts = Counter()
+    for product_id, count in order.products.values_list("product_id", "count"):
+        product_counts[product_id] += count
+
+    missing_product_ids = reserve_stock(order, product_counts)
+    if missing_product_ids:
+        raise ValidationError(
+            {
+                "products": [
+                    f"Not enough stock for product {product_id}."
+                    for product_id in missing_product_ids
+                ]
+            }
+        )
+
+    order.totalCost = order.products.aggregate(
+        total_cost=Coalesce(
+            Sum(F("count") * F("product__effective_price")),
+            0,
+            output_field=DecimalField(max_digits=10, decimal_places=2),
+        )
+    )["total_cost"]
+    order.save(update_fields=["totalCost"])
 
 
 def check_and_update_express_delivery(order_data) -> None:
@@ -1,3 +1,220 @@
-from django.test import TestCase
+import threading
+from datetime import timedelta
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from orders import reservations
+from orders.models import Order, OrderProduct, StockReservation
+from products.models import Product
+from profiles.models import Avatar, Profile
+
+
+def create_profile() -> Profile:
+    """Create a new user with a profile."""
+    user = User.objects.create_user(username=f"user{User.objects.count()}")
+    return Profile.objects.create(
+        user=user, fullName="User", avatar=Avatar.objects.create(alt="avatar")
+    )
+
+
+def create_order() -> Order:
+    """Create an order of a new user."""
+    return Order.objects.create(profile=create_profile())
+
+
+class OrderCreateTest(TestCase):
+    """Tests for placing orders with several lines."""
+
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.profile = create_profile()
+        self.client.force_authenticate(self.profile.user)
+        self.products = [
+            Product.objects.create(title="Product", price=price, count=10)
+            for price in (10, 20, 30)
+        ]
+        self.url = reverse("orders:orders")
+
+    def place_order(self, *lines: dict):
+        """Place an order with the lines of product ids and counts."""
+        return self.client.post(self.url, list(lines), format="json")
+
+    def test_merged_lines(self) -> None:
+        """Lines of the same product are merged and the total cost is calculated."""
+        first, second = self.products[0].pk, self.products[1].pk
+        response = self.place_order(
+            {"id": first, "count": 2},
+            {"id": second, "count": 1},
+            {"id": first, "count": 1},
+        )
+        self.assertEqual(response.status_code, 201)
+
+        order = Order.objects.get(pk=response.json()["orderId"])
+        self.assertEqual(
+            dict(order.products.values_list("product_id", "count")), {first: 3, second: 1}
+        )
+        self.assertEqual(order.totalCost, 50)
+
+    def test_invalid_lines(self) -> None:
+        """No order is placed if a line is invalid."""
+        product_id = self.products[0].pk
+        for invalid in (
+            {"id": 0, "count": 1},
+            {"id": "x"},
+            {"id": product_id, "count": 0},
+        ):
+            with self.subTest(invalid):
+                response = self.place_order({"id": product_id, "count": 1}, invalid)
+                self.assertEqual(response.status_code, 400)
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(StockReservation.objects.exists())
+
+    def test_query_count(self) -> None:
+        """An order costs as many queries for any number of lines."""
+        with CaptureQueriesContext(connection) as queries:
+            self.place_order({"id": self.products[0].pk, "count": 1})
+        with self.assertNumQueries(len(queries)):
+            self.place_order(
+                *({"id": product.pk, "count": 2} for product in self.products)
+            )
+
+
+class OrderHistoryTest(TestCase):
+    """Tests for the order history and the order detail."""
+
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.profile = create_profile()
+        self.client.force_authenticate(self.profile.user)
+        self.orders = [Order.objects.create(profile=self.profile) for _ in range(25)]
+        create_order()
+
+    def test_order_history_pages(self) -> None:
+        """The history lists summaries of the user's orders, from the latest one."""
+        response = self.client.get(reverse("orders:orders"))
+        self.assertEqual(response.status_code, 200)
+        page = response.json()
+        self.assertEqual(len(page["items"]), 20)
+        self.assertNotIn("products", page["items"][0])
+        self.assertIsNone(page["previous"])
+
+        next_page = self.client.get(page["next"]).json()
+        self.assertIsNone(next_page["next"])
+        self.assertIsNotNone(next_page["previous"])
+        self.assertEqual(
+            [item["id"] for item in page["items"] + next_page["items"]],
+            [order.pk for order in reversed(self.orders)],
+        )
+
+    def test_order_detail_query_count(self) -> None:
+        """An order costs as many queries for any number of products."""
+        order, other_order = self.orders[:2]
+        for count, product_order in enumerate((order, other_order, other_order), 1):
+            product = Product.objects.create(title="Product", price=10, count=10)
+            OrderProduct.objects.create(order=product_order, product=product, count=count)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("orders:order_view", args=(order.pk,)))
+        self.assertEqual(len(response.json()["products"]), 1)
+        with self.assertNumQueries(len(queries)):
+            response = self.client.get(
+                reverse("orders:order_view", args=(other_order.pk,))
+            )
+        self.assertEqual(len(response.json()["products"]), 2)
+
+    def test_other_user_order(self) -> None:
+        """The order of another user is not found."""
+        order = Order.objects.exclude(profile=self.profile).get()
+        response = self.client.get(reverse("orders:order_view", args=(order.pk,)))
+        self.assertEqual(response.status_code, 404)
+
+
+class StockReservationTest(TestCase):
+    """Tests for reserving the stock of products for orders."""
+
+    def setUp(self) -> None:
+        self.product = Product.objects.create(title="Product", price=100, count=5)
+        self.order = create_order()
+
+    def get_count(self) -> int:
+        """Get the stock count of the product."""
+        self.product.refresh_from_db()
+        return self.product.count
+
+    def test_commit(self) -> None:
+        """Paying for the order makes its reservation permanent."""
+        self.assertEqual(reservations.reserve_stock(self.order, {self.product.pk: 2}), [])
+        self.assertTrue(reservations.commit_stock(self.order))
+        self.assertEqual(self.get_count(), 3)
+        self.assertFalse(StockReservation.objects.exists())
+        self.assertEqual(
+            reservations.release_expired_stock(timezone.now() + timedelta(days=1)), 0
+        )
+
+    def test_not_enough_stock(self) -> None:
+        """Nothing is reserved if a product does not have enough stock."""
+        self.assertEqual(
+            reservations.reserve_stock(self.order, {self.product.pk: 6}),
+            [self.product.pk],
+        )
+        self.assertEqual(self.get_count(), 5)
+        self.assertFalse(StockReservation.objects.exists())
+
+    def test_commit_expired(self) -> None:
+        """An expired reservation is not committed, even before it is released."""
+        reservations.reserve_stock(self.order, {self.product.pk: 2}, timeout=timedelta(0))
+        self.assertFalse(reservations.commit_stock(self.order))
+        self.assertEqual(self.get_count(), 3)
+
+        self.assertEqual(reservations.release_expired_stock(), 1)
+        self.assertEqual(self.get_count(), 5)
+        self.assertFalse(reservations.commit_stock(self.order))
+
+    def test_expired_stock_available(self) -> None:
+        """The stock of an expired reservation can be reserved by another order."""
+        reservations.reserve_stock(self.order, {self.product.pk: 5}, timeout=timedelta(0))
+        other_order = create_order()
+        missing = reservations.reserve_stock(other_order, {self.product.pk: 4})
+        self.assertEqual(missing, [])
+        self.assertEqual(self.get_count(), 1)
+
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, reservations.ORDER_CANCELED)
+        self.assertTrue(reservations.commit_stock(other_order))
+        self.assertFalse(reservations.commit_stock(self.order))
+
+
+class StockReservationConcurrencyTest(TransactionTestCase):
+    """Tests for reserving the stock of products by parallel checkouts."""
+
+    def test_no_oversell(self) -> None:
+        """Parallel checkouts reserve at most the stock of the product."""
+        product = Product.objects.create(title="Product", price=100, count=5)
+        orders = [create_order() for _ in range(12)]
+        barrier = threading.Barrier(len(orders))
+        results = []
+
+        def checkout(order: Order) -> None:
+            try:
+                barrier.wait()
+                results.append(reservations.reserve_stock(order, {product.pk: 1}))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=checkout, args=(order,)) for order in orders]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(results), len(orders))
+        self.assertEqual(results.count([]), 5)
+        product.refresh_from_db()
+        self.assertEqual(product.count, 0)
+        self.assertEqual(StockReservation.objects.count(), 5)
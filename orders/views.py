@@ -2,11 +2,14 @@ from django.db import transaction
 from django.db.models.query import QuerySet
 from django.shortcuts import get_object_or_404
 from rest_framework import generics, status
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
 from orders import serializers, services
 from orders.models import Order
+from orders.paginations import OrderPagination
+from orders.reservations import commit_stock
 from products.services import delete_basket
 
 
@@ -18,15 +21,26 @@ class OrderMixin:
     lookup_url_kwarg = "id"
 
     def get_object(self):
-        """Get the order object or return a 404 error if the object is not found."""
-        return get_object_or_404(Order, pk=self.kwargs.get(self.lookup_url_kwarg))
+        """Get the order of the user or return a 404 error if the object is not found."""
+        return get_object_or_404(
+            services.get_order_detail_queryset().filter(
+                profile=self.request.user.profile
+            ),
+            pk=self.kwargs.get(self.lookup_url_kwarg),
+        )
 
 
 class OrderListCreateApiView(OrderMixin, generics.ListCreateAPIView):
     """API for creating and retrieving a list of orders."""
 
     serializer_class = serializers.OrderSerializer
-    pagination_class = None
+    pagination_class = OrderPagination
+
+    def get_serializer_class(self):
+        """Get the summary serializer for the order history and the full one otherwise."""
+        if self.request.method == "GET":
+            return serializers.OrderSummarySerializer
+        return super().get_serializer_class()
 
     def create(self, request, *args, **kwargs) -> Response:
         """Create a new order and return its ID or validation errors."""
@@ -51,10 +65,8 @@ class OrderListCreateApiView(OrderMixin, generics.ListCreateAPIView):
         )
 
     def get_queryset(self) -> QuerySet:
-        """Return the queryset of orders for the user, sorted by creation date."""
-        return Order.objects.filter(profile=self.request.user.profile).order_by(
-            "createdAt"
-        )
+        """Return the queryset of orders for the user."""
+        return Order.objects.filter(profile=self.request.user.profile)
 
 
 class OrderApiView(OrderMixin, generics.RetrieveUpdateAPIView):
@@ -75,8 +87,13 @@ class OrderPaymentApiView(OrderMixin, generics.UpdateAPIView):
         payment_serializer = serializers.PaymentSerializer(data=request.data)
 
         if payment_serializer.is_valid():
-            request.data["status"] = "accepted"
-            self.partial_update(request, *args, **kwargs)
+            with transaction.atomic():
+                if not commit_stock(self.get_object()):
+                    raise ValidationError(
+                        {"order": ["The reservation of the order has expired."]}
+                    )
+                request.data["status"] = "accepted"
+                self.partial_update(request, *args, **kwargs)
             return Response(status=status.HTTP_200_OK)
 
         return Response(payment_serializer.errors, status=status.HTTP_400_BAD_REQUEST)
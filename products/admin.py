@@ -69,7 +69,9 @@ class ProductAdmin(admin.ModelAdmin):
     )
     readonly_fields = (
         "date",
+        "updated_at",
         "rating",
+        "effective_price",
     )
     filter_horizontal = (
         "tags",
@@ -84,9 +86,11 @@ class ProductAdmin(admin.ModelAdmin):
                 "fields": (
                     "title",
                     "price",
+                    "effective_price",
                     "count",
                     "rating",
                     "date",
+                    "updated_at",
                     "freeDelivery",
                 )
             },
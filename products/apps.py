@@ -1,6 +1,13 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class ProductsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "products"
+
+    def ready(self) -> None:
+        """Connect the signal handlers and register the system checks of the app."""
+        from products import checks, signals  # noqa: F401
+
+        post_migrate.connect(signals.restore_search_index, sender=self)
@@ -0,0 +1,233 @@
+import asyncio
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+from django.db.models.query import QuerySet
+from django.http import Http404, HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from django.views import View
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from products import serializers, services, views
+from products.cache import get_cached_catalog_data
+from products.categories import get_category_tree
+from products.models import Product
+from products.paginations import CatalogPagination, ProductPagination
+
+
+async def run_in_thread(func: Callable, *args: Any) -> Any:
+    """
+    Run blocking code in a thread of its own, so that several calls run
+    concurrently. Every thread keeps its own database connection, which is
+    closed when it has expired, like at the start and the end of a request.
+    """
+
+    def run() -> Any:
+        close_old_connections()
+        try:
+            return func(*args)
+        finally:
+            close_old_connections()
+
+    return await sync_to_async(run, thread_sensitive=False)()
+
+
+class AsyncAPIView(View):
+    """
+    Base class for read-only async API views, which render their data as JSON
+    like the DRF views do. Under ASGI the views wait for the database without
+    holding a worker, so slow clients do not block the other requests.
+    """
+
+    http_method_names = ["get", "head", "options"]
+
+    async def dispatch(self, request, *args, **kwargs) -> HttpResponse:
+        """Dispatch the request, rendering the API errors like DRF does."""
+        try:
+            return await super().dispatch(request, *args, **kwargs)
+        except Http404:
+            return self.render({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
+        except APIException as exc:
+            data = (
+                exc.detail
+                if isinstance(exc.detail, (list, dict))
+                else {"detail": exc.detail}
+            )
+            return self.render(data, status=exc.status_code)
+
+    @staticmethod
+    def render(
+        data: Any, status: int = status.HTTP_200_OK, headers: Optional[Dict] = None
+    ) -> HttpResponse:
+        """Render the data into a JSON response."""
+        return HttpResponse(
+            JSONRenderer().render(data),
+            content_type="application/json",
+            status=status,
+            headers=headers,
+        )
+
+
+class AsyncCatalogView(AsyncAPIView):
+    """Async version of the catalog API, with the same filters and pagination."""
+
+    pagination_class = CatalogPagination
+
+    async def get(self, request) -> HttpResponse:
+        """List the catalog page, with facets for the filters if they are requested."""
+        etag = quote_etag(services.get_catalog_etag(request))
+        response = get_conditional_response(request, etag=etag)
+        if response is not None:
+            response["ETag"] = etag
+            return response
+
+        self.filter_params = services.convert_filters_and_sort_params_product(
+            query_params=request.GET
+        )
+        # Validating the filters queries the tags, and filtering by category
+        # or name may load the category tree or check the search index, so
+        # the queryset and the count cache key are built in a thread.
+        queryset, self.count_cache_key = await sync_to_async(self.get_filtered_queryset)()
+
+        paginator = self.pagination_class()
+        page = paginator.apaginate_queryset(queryset, Request(request), view=self)
+        if request.GET.get("facets") in ("1", "true"):
+            products, facets = await asyncio.gather(
+                page, run_in_thread(services.get_catalog_facets, self.filter_params)
+            )
+        else:
+            products, facets = await page, None
+
+        serializer = serializers.ProductShortSerializer(products, many=True)
+        data = paginator.get_paginated_response(serializer.data).data
+        if facets is not None:
+            data["facets"] = facets
+        return self.render(data, headers={"ETag": etag})
+
+    def get_filtered_queryset(self) -> Tuple[QuerySet[Product], Optional[str]]:
+        """
+        Get the filtered catalog products and the cache key for their number,
+        which is None when the filters are invalid.
+        """
+        queryset = services.filter_catalog(
+            services.get_product_card_queryset(), self.filter_params
+        )
+        return queryset, services.get_catalog_count_cache_key(self.filter_params)
+
+    def get_count_cache_key(self) -> Optional[str]:
+        """Get the cache key for the number of products matching the filters."""
+        return self.count_cache_key
+
+
+class AsyncProductView(AsyncAPIView):
+    """Async version of the product detail API."""
+
+    async def get(self, request, pk: int) -> HttpResponse:
+        """Retrieve detailed information about a specific product."""
+        updated_at = (
+            await Product.objects.filter(pk=pk)
+            .values_list("updated_at", flat=True)
+            .afirst()
+        )
+        if updated_at is None:
+            raise Http404
+        etag = quote_etag(services.make_product_etag(pk, updated_at))
+        last_modified = int(updated_at.timestamp())
+
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            try:
+                product = await services.get_product_detail_queryset().aget(pk=pk)
+            except Product.DoesNotExist:
+                raise Http404
+            # The rating histogram is queried while serializing.
+            data = await sync_to_async(
+                lambda: serializers.ProductSerializer(product).data
+            )()
+            response = self.render(data)
+
+        response["ETag"] = etag
+        response["Last-Modified"] = http_date(last_modified)
+        return response
+
+
+def get_popular_data() -> List:
+    """Serialize the popular products based on the number of reviews."""
+    queryset = views.ProductViewSet.queryset.order_by("-reviews_count")[:5]
+    return serializers.ProductShortSerializer(queryset, many=True).data
+
+
+def get_limited_data() -> List:
+    """Serialize the products with limited availability based on the stock count."""
+    queryset = views.ProductViewSet.queryset.order_by("count")[:5]
+    return serializers.ProductShortSerializer(queryset, many=True).data
+
+
+def get_banners_data() -> List:
+    """Serialize random products to be displayed as banners."""
+    products = services.get_banner_products(views.ProductViewSet.queryset)
+    return serializers.ProductShortSerializer(products, many=True).data
+
+
+def get_sales_data() -> List:
+    """Serialize the first page of the discounted products."""
+    queryset = views.ProductSaleListView.queryset.all()[: ProductPagination.page_size]
+    return serializers.ProductSaleSerializer(queryset, many=True).data
+
+
+def get_categories_data() -> List:
+    """Serialize the category tree from the memory of the process."""
+    return get_category_tree().data
+
+
+# Sections of the home feed with their builders and cache lifetimes.
+HOME_SECTIONS = {
+    "banners": (get_banners_data, views.BANNERS_CACHE_TIMEOUT),
+    "popular": (get_popular_data, views.POPULAR_CACHE_TIMEOUT),
+    "limited": (get_limited_data, views.LIMITED_CACHE_TIMEOUT),
+    "sales": (get_sales_data, views.SALES_CACHE_TIMEOUT),
+    "categories": (get_categories_data, views.CATEGORIES_CACHE_TIMEOUT),
+}
+
+
+class HomeFeedView(AsyncAPIView):
+    """
+    API for the data of the home page: banners, popular and limited products,
+    sales and categories. The sections are independent, so they are cached
+    separately and built concurrently, each in a thread of its own.
+    """
+
+    async def get(self, request) -> HttpResponse:
+        """Retrieve every section of the home page."""
+        sections = await asyncio.gather(
+            *(
+                run_in_thread(get_cached_catalog_data, f"home:{name}", builder, timeout)
+                for name, (builder, timeout) in HOME_SECTIONS.items()
+            )
+        )
+        return self.render(dict(zip(HOME_SECTIONS, sections)))
+
+
+class AsyncBasketView(AsyncAPIView):
+    """Async version of reading the user's basket."""
+
+    async def get(self, request) -> HttpResponse:
+        """Retrieve the contents of the user's basket."""
+        # The session and the user are loaded lazily with the sync ORM.
+        items = await sync_to_async(services.get_basket_items)(request)
+        products = [
+            product
+            async for product in services.get_product_card_queryset().filter(
+                id__in=items.keys()
+            )
+        ]
+        for product in products:
+            product.count = items[product.id]
+        return self.render(serializers.ProductShortSerializer(products, many=True).data)
@@ -0,0 +1,270 @@
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, NamedTuple, Optional
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.db.models.query import QuerySet
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from products.models import BasketItem
+
+BASKET_SESSION_KEY = "basket_id"
+SESSION_BASKET_PREFIX = "session:"
+BASKET_CACHE_TIMEOUT = 60 * 60 * 24 * 30
+BASKET_LOCK_TIMEOUT = 5
+
+
+class BasketLockError(Exception):
+    """Raised when the lock of a basket cannot be acquired in time."""
+
+
+class BasketOperation(NamedTuple):
+    """Change of the count of a product in a basket."""
+
+    action: str
+    product_id: int
+    count: int
+
+
+ADD = "add"
+REMOVE = "remove"
+SET = "set"
+BASKET_ACTIONS = (ADD, REMOVE, SET)
+
+
+def apply_operation(items: Dict[int, int], operation: BasketOperation) -> None:
+    """Apply a basket operation to the counts of products by product id."""
+    count = items.get(operation.product_id, 0)
+    if operation.action == ADD:
+        count += operation.count
+    elif operation.action == REMOVE:
+        count -= operation.count
+    else:
+        count = operation.count
+
+    if count > 0:
+        items[operation.product_id] = count
+    else:
+        items.pop(operation.product_id, None)
+
+
+class BasketStore(ABC):
+    """
+    Base class of shopping basket stores. A basket maps product ids to counts
+    and is identified by a basket id, so that it does not live in the session.
+    """
+
+    def __init__(self, basket_id: str) -> None:
+        self.basket_id = basket_id
+
+    @abstractmethod
+    def get_items(self) -> Dict[int, int]:
+        """Get the counts of products in the basket by product id."""
+
+    @abstractmethod
+    def apply(self, operations: Iterable[BasketOperation]) -> None:
+        """Apply the operations to the basket as a whole."""
+
+    def add(self, product_id: int, count: int) -> None:
+        """Add the count of a product to the basket."""
+        self.apply([BasketOperation(ADD, product_id, count)])
+
+    def remove(self, product_id: int, count: int) -> None:
+        """Remove the count of a product from the basket, deleting it if none is left."""
+        self.apply([BasketOperation(REMOVE, product_id, count)])
+
+    def set(self, product_id: int, count: int) -> None:
+        """Set the count of a product in the basket, deleting it if the count is zero."""
+        self.apply([BasketOperation(SET, product_id, count)])
+
+    @abstractmethod
+    def clear(self) -> None:
+        """Remove every product from the basket."""
+
+    @classmethod
+    def clear_expired(cls, expired_before: datetime) -> int:
+        """
+        Remove the anonymous baskets that have not changed since the time and
+        return their number. Stores whose baskets expire by themselves keep
+        this default, which removes nothing.
+        """
+        return 0
+
+    def merge(self, other: "BasketStore") -> None:
+        """Move the products of another basket into this basket."""
+        self.apply(
+            BasketOperation(ADD, product_id, count)
+            for product_id, count in other.get_items().items()
+        )
+        other.clear()
+
+
+class CacheBasketStore(BasketStore):
+    """
+    Basket stored as a single value in the cache. Updates of a basket are
+    serialized with a lock, so parallel requests do not lose each other's
+    changes. The lock relies on an atomic cache.add, which the file-based
+    cache does not have, so the store cannot be used with it.
+    """
+
+    def __init__(self, basket_id: str) -> None:
+        super().__init__(basket_id)
+        self.cache_key = f"basket:{basket_id}"
+
+    def get_items(self) -> Dict[int, int]:
+        """Get the counts of products in the basket by product id."""
+        return cache.get(self.cache_key, {})
+
+    def apply(self, operations: Iterable[BasketOperation]) -> None:
+        """Apply the operations with a single read and write of the basket."""
+        with self.lock():
+            items = self.get_items()
+            for operation in operations:
+                apply_operation(items, operation)
+            cache.set(self.cache_key, items, BASKET_CACHE_TIMEOUT)
+
+    def clear(self) -> None:
+        """Remove every product from the basket."""
+        cache.delete(self.cache_key)
+
+    @contextmanager
+    def lock(self) -> Iterator[None]:
+        """Hold the lock of the basket, waiting for other requests to release it."""
+        lock_key = f"{self.cache_key}:lock"
+        deadline = time.monotonic() + BASKET_LOCK_TIMEOUT
+        while not cache.add(lock_key, True, BASKET_LOCK_TIMEOUT):
+            if time.monotonic() > deadline:
+                raise BasketLockError(f"Could not lock the basket {self.basket_id}.")
+            time.sleep(0.01)
+        try:
+            yield
+        finally:
+            cache.delete(lock_key)
+
+
+class DatabaseBasketStore(BasketStore):
+    """
+    Basket stored as a row per product in the database. Every change updates
+    a single row in place, so parallel requests do not lose each other's
+    changes. Anonymous baskets are kept until they are removed by
+    clear_expired.
+    """
+
+    def get_items(self) -> Dict[int, int]:
+        """Get the counts of products in the basket by product id."""
+        return dict(
+            BasketItem.objects.filter(basket_id=self.basket_id).values_list(
+                "product_id", "count"
+            )
+        )
+
+    @transaction.atomic
+    def apply(self, operations: Iterable[BasketOperation]) -> None:
+        """
+        Apply the operations in a single transaction, marking every item of
+        the basket as changed, so that the basket expires as a whole.
+        """
+        for operation in operations:
+            item = BasketItem.objects.filter(
+                basket_id=self.basket_id, product_id=operation.product_id
+            )
+            if operation.action == ADD:
+                if operation.count > 0:
+                    self.upsert(item, F("count") + operation.count, operation)
+            elif operation.action == REMOVE:
+                if not item.filter(count__gt=operation.count).update(
+                    count=F("count") - operation.count
+                ):
+                    item.filter(count__lte=operation.count).delete()
+            elif operation.count > 0:
+                self.upsert(item, operation.count, operation)
+            else:
+                item.delete()
+        BasketItem.objects.filter(basket_id=self.basket_id).update(
+            updated_at=timezone.now()
+        )
+
+    def upsert(self, item: QuerySet, count, operation: BasketOperation) -> None:
+        """Update the count of the basket item, inserting its row if it is new."""
+        if item.update(count=count):
+            return
+        try:
+            with transaction.atomic():
+                BasketItem.objects.create(
+                    basket_id=self.basket_id,
+                    product_id=operation.product_id,
+                    count=operation.count,
+                )
+        except IntegrityError:
+            # A parallel request has inserted the row first, anything else
+            # is a real error.
+            if not item.update(count=count):
+                raise
+
+    def clear(self) -> None:
+        """Remove every product from the basket."""
+        BasketItem.objects.filter(basket_id=self.basket_id).delete()
+
+    @classmethod
+    def clear_expired(cls, expired_before: datetime) -> int:
+        """
+        Remove the anonymous baskets that have not changed since the time and
+        return their number.
+        """
+        expired = BasketItem.objects.filter(
+            basket_id__startswith=SESSION_BASKET_PREFIX, updated_at__lt=expired_before
+        )
+        count = expired.values("basket_id").distinct().count()
+        expired.delete()
+        return count
+
+
+def get_basket_store_class() -> type:
+    """Get the basket store class selected by the BASKET_STORE setting."""
+    return import_string(settings.BASKET_STORE)
+
+
+def get_user_basket_id(user) -> str:
+    """Get the id of the basket of an authenticated user."""
+    return f"user:{user.pk}"
+
+
+def get_basket_id(request, create=False) -> Optional[str]:
+    """
+    Get the id of the basket of the user. Authenticated users have a basket
+    of their own, and anonymous users get a basket whose id is kept in the
+    session when the create flag is set.
+    """
+    if request.user.is_authenticated:
+        return get_user_basket_id(request.user)
+
+    basket_id = request.session.get(BASKET_SESSION_KEY)
+    if basket_id is None and create:
+        basket_id = f"{SESSION_BASKET_PREFIX}{uuid4().hex}"
+        request.session[BASKET_SESSION_KEY] = basket_id
+    return basket_id
+
+
+def get_basket(request, create=False) -> Optional[BasketStore]:
+    """Get the basket of the user, or None if an anonymous user has no basket yet."""
+    basket_id = get_basket_id(request, create=create)
+    if basket_id is None:
+        return None
+    return get_basket_store_class()(basket_id)
+
+
+def merge_session_basket(request, user) -> None:
+    """Move the products of the anonymous basket of the session into the user's basket."""
+    basket_id = request.session.pop(BASKET_SESSION_KEY, None)
+    if basket_id is None:
+        return
+
+    store_class = get_basket_store_class()
+    store_class(get_user_basket_id(user)).merge(store_class(basket_id))
@@ -0,0 +1,210 @@
+import json
+import time
+from functools import wraps
+from hashlib import md5
+from typing import Any, Callable, Dict, Optional
+
+from django.core.cache import cache
+from django.db.models.query import QuerySet
+from rest_framework import status
+from rest_framework.response import Response
+
+from config.routers import primary_pinning
+
+CATALOG_VERSION_KEY = "catalog:version"
+STOCK_VERSION_KEY = "stock:version"
+COUNT_CACHE_TIMEOUT = 60 * 10
+RESPONSE_CACHE_STATS_KEY = "response:stats:{name}:{result}"
+RESPONSE_CACHE_NAMES_KEY = "response:stats:names"
+
+# The cached values are built from the primary database. A lagging read
+# replica would store outdated data under the new catalog version.
+
+
+def get_version(version_key: str) -> int:
+    """Get the current version of the data stored under the version key."""
+    version = cache.get(version_key)
+    if version is None:
+        # Start from the current time rather than from 1, so that a version
+        # evicted from the cache never matches keys written before it.
+        cache.add(version_key, time.time_ns(), timeout=None)
+        version = cache.get(version_key)
+    return version
+
+
+def bump_version(version_key: str) -> None:
+    """Invalidate every cached value derived from the versioned data."""
+    try:
+        cache.incr(version_key)
+    except ValueError:
+        get_version(version_key)
+
+
+def get_catalog_version() -> int:
+    """Get the current version of the catalog data."""
+    return get_version(CATALOG_VERSION_KEY)
+
+
+def bump_catalog_version() -> None:
+    """Invalidate every cached value derived from the catalog data."""
+    bump_version(CATALOG_VERSION_KEY)
+
+
+def get_stock_version() -> int:
+    """Get the current version of the stock counts of products."""
+    return get_version(STOCK_VERSION_KEY)
+
+
+def bump_stock_version() -> None:
+    """Mark the stock counts of products as changed, keeping the cached catalog data."""
+    bump_version(STOCK_VERSION_KEY)
+
+
+def make_catalog_cache_key(prefix: str, params: Dict) -> str:
+    """Make a cache key for catalog data from canonical filter parameters."""
+    canonical_params = {
+        key: sorted(str(item) for item in value)
+        if isinstance(value, (list, tuple))
+        else str(value)
+        for key, value in params.items()
+    }
+    digest = md5(json.dumps(canonical_params, sort_keys=True).encode()).hexdigest()
+    return f"catalog:{prefix}:{get_catalog_version()}:{digest}"
+
+
+def get_cached_count(queryset: QuerySet, cache_key: Optional[str]) -> int:
+    """Get the number of objects in the queryset, counting it once per cache key."""
+    if cache_key is None:
+        return queryset.count()
+
+    count = cache.get(cache_key)
+    if count is None:
+        with primary_pinning(True):
+            count = queryset.count()
+        cache.set(cache_key, count, COUNT_CACHE_TIMEOUT)
+    return count
+
+
+async def aget_cached_count(queryset: QuerySet, cache_key: Optional[str]) -> int:
+    """Get the number of objects in the queryset like get_cached_count, asynchronously."""
+    if cache_key is None:
+        return await queryset.acount()
+
+    count = await cache.aget(cache_key)
+    if count is None:
+        with primary_pinning(True):
+            count = await queryset.acount()
+        await cache.aset(cache_key, count, COUNT_CACHE_TIMEOUT)
+    return count
+
+
+def get_cached_catalog_data(name: str, builder: Callable[[], Any], timeout: int) -> Any:
+    """
+    Get data derived from the catalog from the cache, building it on a miss.
+    Like the cached responses, the data is invalidated by every change of the
+    catalog.
+    """
+    cache_key = f"catalog:data:{name}:{get_catalog_version()}"
+    data = cache.get(cache_key)
+    if data is None:
+        with primary_pinning(True):
+            data = builder()
+        cache.set(cache_key, data, timeout)
+    return data
+
+
+def increment_counter(key: str) -> None:
+    """Increment a counter stored in the cache."""
+    if not cache.add(key, 1, timeout=None):
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, 1, timeout=None)
+
+
+def cache_response(name: str, timeout: int) -> Callable:
+    """
+    Decorator for view methods that caches the data of successful responses
+    per full request path. The cache keys contain the catalog version, so the
+    cached responses are invalidated whenever the catalog changes. Every
+    response has an X-Cache header, and hits and misses are counted per name.
+    """
+
+    def decorator(method: Callable) -> Callable:
+        @wraps(method)
+        def wrapper(view, request, *args, **kwargs) -> Response:
+            path_digest = md5(request.get_full_path().encode()).hexdigest()
+            cache_key = f"response:{name}:{get_catalog_version()}:{path_digest}"
+            data = cache.get(cache_key)
+
+            if data is not None:
+                increment_counter(
+                    RESPONSE_CACHE_STATS_KEY.format(name=name, result="hits")
+                )
+                response = Response(data)
+                response["X-Cache"] = "HIT"
+                return response
+
+            increment_counter(RESPONSE_CACHE_STATS_KEY.format(name=name, result="misses"))
+            with primary_pinning(True):
+                response = method(view, request, *args, **kwargs)
+            if response.status_code == status.HTTP_200_OK:
+                cache.set(cache_key, response.data, timeout)
+                names = cache.get(RESPONSE_CACHE_NAMES_KEY, set())
+                if name not in names:
+                    cache.set(RESPONSE_CACHE_NAMES_KEY, names | {name}, timeout=None)
+            response["X-Cache"] = "MISS"
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+def get_response_cache_stats() -> Dict[str, Dict[str, int]]:
+    """Get the number of response cache hits and misses per cached endpoint."""
+    return {
+        name: {
+            result: cache.get(
+                RESPONSE_CACHE_STATS_KEY.format(name=name, result=result), 0
+            )
+            for result in ("hits", "misses")
+        }
+        for name in sorted(cache.get(RESPONSE_CACHE_NAMES_KEY, set()))
+    }
+
+
+class VersionedLocalCache:
+    """
+    Cache of a value in the memory of the process. The value is rebuilt when
+    its version in the shared cache is bumped, which invalidates it in every
+    process, or when it is older than the timeout.
+    """
+
+    def __init__(
+        self, version_key: str, builder: Callable[[], Any], timeout: Optional[int] = None
+    ) -> None:
+        self.version_key = version_key
+        self.builder = builder
+        self.timeout = timeout
+        self.snapshot = None
+
+    def get(self) -> Any:
+        """Get the cached value, rebuilding it if it is outdated."""
+        version = get_version(self.version_key)
+        snapshot = self.snapshot
+        if (
+            snapshot is None
+            or snapshot[0] != version
+            or (
+                self.timeout is not None and time.monotonic() - snapshot[1] > self.timeout
+            )
+        ):
+            with primary_pinning(True):
+                snapshot = (version, time.monotonic(), self.builder())
+            self.snapshot = snapshot
+        return snapshot[2]
+
+    def invalidate(self) -> None:
+        """Invalidate the cached value in every process."""
+        bump_version(self.version_key)
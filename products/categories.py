@@ -0,0 +1,77 @@
+from typing import Dict, FrozenSet, List
+
+from products.cache import VersionedLocalCache
+from products.models import Category
+from products.serializers import CategoryImageSerializer
+
+CATEGORY_TREE_VERSION_KEY = "categories:version"
+
+
+class CategoryTree:
+    """
+    Tree of product categories of any depth with their images, built from
+    a single query over categories ordered by their materialized paths.
+    """
+
+    def __init__(self, categories: List[Category]) -> None:
+        self.children: Dict[int, List[Category]] = {}
+        self.roots: List[Category] = []
+        for category in categories:
+            if category.category_id is None:
+                self.roots.append(category)
+            else:
+                self.children.setdefault(category.category_id, []).append(category)
+
+        self.descendant_ids: Dict[int, FrozenSet[int]] = {}
+        for category in categories:
+            self.descendant_ids[category.pk] = frozenset(self.collect_ids(category.pk))
+
+        self.data = [self.serialize(category, root=True) for category in self.roots]
+
+    def collect_ids(self, category_id: int) -> List[int]:
+        """Collect the id of the category and the ids of all its descendants."""
+        ids = [category_id]
+        for child in self.children.get(category_id, ()):
+            ids.extend(self.collect_ids(child.pk))
+        return ids
+
+    def serialize(self, category: Category, root=False) -> Dict:
+        """
+        Serialize the category in the format of CategorySerializer. Categories
+        below the root level have subcategories only if they have children.
+        """
+        data = {
+            "id": category.pk,
+            "title": category.title,
+            "image": (
+                CategoryImageSerializer(category.image).data
+                if hasattr(category, "image")
+                else None
+            ),
+        }
+        children = self.children.get(category.pk, ())
+        if root or children:
+            data["subcategories"] = [self.serialize(child) for child in children]
+        return data
+
+    def get_descendant_ids(self, category_id: int) -> FrozenSet[int]:
+        """Get the id of the category and the ids of all its descendants."""
+        return self.descendant_ids.get(category_id, frozenset())
+
+
+def build_category_tree() -> CategoryTree:
+    """Build the category tree from the database with a single ordered range scan."""
+    return CategoryTree(list(Category.objects.select_related("image").order_by("path")))
+
+
+category_tree_cache = VersionedLocalCache(CATEGORY_TREE_VERSION_KEY, build_category_tree)
+
+
+def get_category_tree() -> CategoryTree:
+    """Get the category tree from the memory of the process."""
+    return category_tree_cache.get()
+
+
+def invalidate_category_tree() -> None:
+    """Invalidate the category tree in every process."""
+    category_tree_cache.invalidate()
@@ -0,0 +1,25 @@
+from typing import List
+
+from django.conf import settings
+from django.core import checks
+
+from products.baskets import CacheBasketStore, get_basket_store_class
+
+
+@checks.register(checks.Tags.caches)
+def check_basket_store_cache(app_configs, **kwargs) -> List[checks.CheckMessage]:
+    """Check that the cache basket store is used with a cache that can lock baskets."""
+    if not issubclass(get_basket_store_class(), CacheBasketStore):
+        return []
+    if settings.CACHES["default"]["BACKEND"].endswith("FileBasedCache"):
+        # FileBasedCache.add checks for the file and writes it in two steps,
+        # so parallel requests could both take the lock of a basket.
+        return [
+            checks.Error(
+                "The cache basket store locks baskets with cache.add, which is "
+                "not atomic in the file-based cache.",
+                hint="Use products.baskets.DatabaseBasketStore as BASKET_STORE.",
+                id="products.E001",
+            )
+        ]
+    return []
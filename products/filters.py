@@ -1,21 +1,29 @@
 import django_filters
-from django.db.models import Case, Count, F, IntegerField, Q, When
+from django import forms
 from django.db.models.query import QuerySet
 
+from products.categories import get_category_tree
 from products.models import Tag
+from products.search import search_products
+
+
+class IntegerFilter(django_filters.NumberFilter):
+    """Filter for whole numbers, which rejects fractions instead of truncating them."""
+
+    field_class = forms.IntegerField
 
 
 class ProductFilter(django_filters.FilterSet):
     """FilterSet for filtering and sorting products."""
 
     name = django_filters.CharFilter(
-        field_name="title", lookup_expr="icontains", label="Product Name (Search)"
+        field_name="title", method="filter_name", label="Product Name (Search)"
     )
     min_price = django_filters.NumberFilter(
-        field_name="price", lookup_expr="gte", label="Minimum Price"
+        field_name="effective_price", lookup_expr="gte", label="Minimum Price"
     )
     max_price = django_filters.NumberFilter(
-        field_name="price", lookup_expr="lte", label="Maximum Price"
+        field_name="effective_price", lookup_expr="lte", label="Maximum Price"
     )
     free_delivery = django_filters.BooleanFilter(
         field_name="freeDelivery", label="Free Delivery"
@@ -30,7 +38,7 @@ class ProductFilter(django_filters.FilterSet):
         conjoined=True,
         label="Tags",
     )
-    category = django_filters.NumberFilter(
+    category = IntegerFilter(
         field_name="category",
         lookup_expr="exact",
         method="filter_category",
@@ -38,6 +46,12 @@ class ProductFilter(django_filters.FilterSet):
     )
     sort_by = django_filters.CharFilter(method="filter_sort", label="Sorting")
 
+    def filter_name(self, queryset, name, value) -> QuerySet:
+        """Filter by a full-text search over the product name and descriptions."""
+        if value:
+            return search_products(queryset, value)
+        return queryset
+
     def filter_available(self, queryset, name, value) -> QuerySet:
         """Filter by product availability."""
         if value:
@@ -45,27 +59,25 @@ class ProductFilter(django_filters.FilterSet):
         return queryset
 
     def filter_category(self, queryset, name, value) -> QuerySet:
-        """Filter by product category."""
+        """Filter by product category, including the products of its descendants."""
         if value:
-            return queryset.filter(Q(category_id=value) | Q(category__category_id=value))
+            category_ids = get_category_tree().get_descendant_ids(value)
+            return queryset.filter(category_id__in=category_ids)
         return queryset
 
     def filter_sort(self, queryset, name, value) -> QuerySet:
         """Sorts products by parameters"""
+        if value == "relevance":
+            if "search_rank" in queryset.query.annotations:
+                return queryset.order_by("search_rank", "id")
+            value = "date"
+
         if value == "reviews":
-            queryset = queryset.annotate(reviews_count=Count("reviews"))
             value = "reviews_count"
 
         if value == "price":
-            queryset = queryset.annotate(
-                final_price=Case(
-                    When(sale__salePrice__isnull=False, then=F("sale__salePrice")),
-                    default=F("price"),
-                    output_field=IntegerField(),
-                )
-            )
-            value = "final_price"
+            value = "effective_price"
 
         if self.data["sort_type"] == "inc":
-            return queryset.order_by(F(value).asc(nulls_last=True))
-        return queryset.order_by(F(value).desc(nulls_last=True))
+            return queryset.order_by(value, "id")
+        return queryset.order_by(f"-{value}", "-id")
@@ -0,0 +1,179 @@
+import asyncio
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from collections import Counter
+from math import ceil
+from typing import Any, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+
+SERVER_MODES = ("wsgi", "asgi")
+DEFAULT_PATHS = ("/api/home/", "/api/catalog/", "/api/async/catalog/")
+SERVER_START_TIMEOUT = 30
+REQUEST_TIMEOUT = 30
+# Slow clients send their requests a few bytes at a time.
+SLOW_CHUNK_SIZE = 8
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure the requests per second and the latency of fast clients while "
+        "slow clients are connected, with gunicorn serving the WSGI application "
+        "by sync workers and the ASGI application by uvicorn workers"
+    )
+
+    def add_arguments(self, parser) -> None:
+        """Add the options of the benchmark."""
+        parser.add_argument("--workers", type=int, default=2)
+        parser.add_argument("--clients", type=int, default=20)
+        parser.add_argument("--slow-clients", type=int, default=100)
+        parser.add_argument(
+            "--slow-time", type=float, default=2, help="seconds to send a slow request"
+        )
+        parser.add_argument("--duration", type=float, default=10, help="seconds per run")
+        parser.add_argument(
+            "--path", dest="paths", action="append", help="path to request, repeatable"
+        )
+        parser.add_argument("--mode", dest="modes", action="append", choices=SERVER_MODES)
+
+    def handle(self, *args: Any, **options: Any) -> Optional[str]:
+        """Run the load against a server in every mode and print the results."""
+        paths = options["paths"] or DEFAULT_PATHS
+        self.stdout.write(
+            f"{options['clients']} clients and {options['slow_clients']} slow clients "
+            f"on {options['workers']} workers for {options['duration']}s per run"
+        )
+        self.stdout.write(
+            f"{'mode':<8}{'requests/s':>12}{'p50 ms':>10}{'p95 ms':>10}"
+            f"{'p99 ms':>10}{'slow':>8}{'errors':>8}"
+        )
+        for mode in options["modes"] or SERVER_MODES:
+            port = self.get_free_port()
+            server = self.start_server(mode, port, options["workers"], paths)
+            try:
+                results, latencies = asyncio.run(self.run_load(port, paths, options))
+            finally:
+                server.terminate()
+                try:
+                    server.wait(timeout=10)
+                except subprocess.TimeoutExpired:
+                    server.kill()
+
+            if len(latencies) > 1:
+                quantiles = statistics.quantiles(latencies, n=100)
+                p50, p95, p99 = (quantiles[i] * 1000 for i in (49, 94, 98))
+            else:
+                p50 = p95 = p99 = float("nan")
+            self.stdout.write(
+                f"{mode:<8}{len(latencies) / options['duration']:>12.1f}"
+                f"{p50:>10.1f}{p95:>10.1f}{p99:>10.1f}"
+                f"{results['slow']:>8}{results['errors']:>8}"
+            )
+
+    @staticmethod
+    def get_free_port() -> int:
+        """Get a local port that nothing listens on."""
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            return sock.getsockname()[1]
+
+    def start_server(
+        self, mode: str, port: int, workers: int, paths: List[str]
+    ) -> subprocess.Popen:
+        """Start gunicorn in the server mode and wait until it serves every path."""
+        server = subprocess.Popen(
+            [
+                sys.executable,
+                "-m",
+                "gunicorn",
+                "--bind",
+                f"127.0.0.1:{port}",
+                "--workers",
+                str(workers),
+            ],
+            cwd=settings.BASE_DIR,
+            env={"CACHE_BACKEND": "file", **os.environ, "SERVER_MODE": mode},
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        deadline = time.monotonic() + SERVER_START_TIMEOUT
+        pending = list(paths)
+        while pending:
+            if server.poll() is not None:
+                raise CommandError(f"The {mode} server exited with {server.returncode}.")
+            if time.monotonic() > deadline:
+                server.kill()
+                raise CommandError(f"The {mode} server did not start in time.")
+            try:
+                status = asyncio.run(self.request(port, pending[0]))
+            except (OSError, ValueError, IndexError):
+                time.sleep(0.2)
+                continue
+            if status != 200:
+                server.kill()
+                raise CommandError(f"{pending[0]} responded with status {status}.")
+            # The first requests also fill the caches of the workers.
+            pending.pop(0)
+        return server
+
+    async def run_load(
+        self, port: int, paths: List[str], options
+    ) -> Tuple[Counter, List[float]]:
+        """Run fast and slow clients until the deadline and collect their results."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + options["duration"]
+        results = Counter()
+        latencies = []
+
+        async def client(send_time: float) -> None:
+            while loop.time() < deadline:
+                started = loop.time()
+                try:
+                    status = await asyncio.wait_for(
+                        self.request(port, random.choice(paths), send_time),
+                        REQUEST_TIMEOUT,
+                    )
+                except (OSError, ValueError, IndexError, asyncio.TimeoutError):
+                    status = None
+                if status != 200:
+                    results["errors"] += 1
+                elif send_time:
+                    results["slow"] += 1
+                else:
+                    latencies.append(loop.time() - started)
+
+        await asyncio.gather(
+            *(client(0) for _ in range(options["clients"])),
+            *(client(options["slow_time"]) for _ in range(options["slow_clients"])),
+        )
+        return results, latencies
+
+    @staticmethod
+    async def request(port: int, path: str, send_time: float = 0) -> int:
+        """Send a GET request, spreading it over send_time seconds, and get the status."""
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        try:
+            data = (
+                f"GET {path} HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n\r\n"
+            ).encode()
+            if send_time:
+                chunk_count = ceil(len(data) / SLOW_CHUNK_SIZE)
+                for start in range(0, len(data), SLOW_CHUNK_SIZE):
+                    end = start + SLOW_CHUNK_SIZE
+                    writer.write(data[start:end])
+                    await writer.drain()
+                    await asyncio.sleep(send_time / chunk_count)
+            else:
+                writer.write(data)
+                await writer.drain()
+            status_line = await reader.readline()
+            await reader.read()
+            return int(status_line.split()[1])
+        finally:
+            writer.close()
@@ -0,0 +1,141 @@
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+from django.db import connection
+
+from config.backends.sqlite3.base import apply_pragmas
+
+# The behaviour of a plain SQLite connection opened by Django.
+DEFAULT_PRAGMAS = {"journal_mode": "delete", "synchronous": "full"}
+DEFAULT_TRANSACTION_MODE = "DEFERRED"
+DEFAULT_TIMEOUT = 5
+
+READ_SQL = (
+    "SELECT id, title, effective_price, rating FROM products "
+    "WHERE effective_price >= ? ORDER BY date DESC LIMIT 20"
+)
+WRITE_SQL = "UPDATE products SET count = ? WHERE id = ?"
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure concurrent read and write throughput on copies of the database "
+        "with the default SQLite settings and with the configured pragmas"
+    )
+
+    def add_arguments(self, parser) -> None:
+        """Add the options of the benchmark."""
+        parser.add_argument("--readers", type=int, default=4)
+        parser.add_argument("--writers", type=int, default=4)
+        parser.add_argument("--duration", type=float, default=5, help="seconds per run")
+
+    def handle(self, *args: Any, **options: Any) -> Optional[str]:
+        """Run the workload with both settings and print the throughput of each."""
+        if connection.vendor != "sqlite":
+            raise CommandError("The benchmark is only supported on SQLite.")
+
+        profiles = (
+            ("default", DEFAULT_PRAGMAS, DEFAULT_TRANSACTION_MODE),
+            (
+                "configured",
+                {
+                    **getattr(settings, "SQLITE_PRAGMAS", {}),
+                    "busy_timeout": DEFAULT_TIMEOUT * 1000,
+                },
+                getattr(settings, "SQLITE_TRANSACTION_MODE", None)
+                or DEFAULT_TRANSACTION_MODE,
+            ),
+        )
+
+        self.stdout.write(
+            f"{options['readers']} readers and {options['writers']} writers "
+            f"for {options['duration']}s per run"
+        )
+        self.stdout.write(
+            f"{'settings':<12}{'reads/s':>10}{'writes/s':>10}{'locked':>10}"
+        )
+        with tempfile.TemporaryDirectory() as directory:
+            for name, pragmas, transaction_mode in profiles:
+                path = Path(directory) / f"{name}.sqlite3"
+                self.copy_database(path, pragmas)
+                results = self.run_workload(path, pragmas, transaction_mode, options)
+                self.stdout.write(
+                    f"{name:<12}{results['reads'] / options['duration']:>10.0f}"
+                    f"{results['writes'] / options['duration']:>10.0f}"
+                    f"{results['locked']:>10}"
+                )
+
+    @staticmethod
+    def copy_database(path: Path, pragmas: Dict) -> None:
+        """Copy the database into the file with the journal mode of the pragmas."""
+        connection.ensure_connection()
+        target = sqlite3.connect(path)
+        try:
+            connection.connection.backup(target)
+            apply_pragmas(target, {"journal_mode": pragmas["journal_mode"]})
+        finally:
+            target.close()
+
+    @staticmethod
+    def run_workload(
+        path: Path, pragmas: Dict, transaction_mode: str, options
+    ) -> Counter:
+        """Run reader and writer threads on the database and count their operations."""
+        results = Counter()
+        results_lock = threading.Lock()
+        deadline = time.monotonic() + options["duration"]
+
+        with sqlite3.connect(path) as setup:
+            product_ids = [row[0] for row in setup.execute("SELECT id FROM products")]
+        if not product_ids:
+            raise CommandError("The benchmark needs products in the database.")
+
+        def worker(write: bool) -> None:
+            db = sqlite3.connect(path, timeout=DEFAULT_TIMEOUT, isolation_level=None)
+            apply_pragmas(db, pragmas)
+            done = Counter()
+            try:
+                while time.monotonic() < deadline:
+                    try:
+                        if write:
+                            # A checkout reads the stock before it writes it.
+                            db.execute(f"BEGIN {transaction_mode}")
+                            product_id = random.choice(product_ids)
+                            db.execute(
+                                "SELECT count FROM products WHERE id = ?", (product_id,)
+                            ).fetchone()
+                            db.execute(WRITE_SQL, (random.randint(0, 100), product_id))
+                            db.execute("COMMIT")
+                            done["writes"] += 1
+                        else:
+                            db.execute(READ_SQL, (random.randint(0, 500),)).fetchall()
+                            done["reads"] += 1
+                    except sqlite3.OperationalError:
+                        if db.in_transaction:
+                            db.execute("ROLLBACK")
+                        done["locked"] += 1
+            finally:
+                db.close()
+                with results_lock:
+                    results.update(done)
+
+        threads = [
+            threading.Thread(target=worker, args=(False,))
+            for _ in range(options["readers"])
+        ] + [
+            threading.Thread(target=worker, args=(True,))
+            for _ in range(options["writers"])
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
@@ -0,0 +1,158 @@
+import re
+from itertools import product as combinations
+from typing import Any, Iterator, List, Optional
+
+from django.core.management import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.http import QueryDict
+
+from products.filters import ProductFilter
+from products.models import Category, Product, Tag
+from products.services import convert_filters_and_sort_params_product
+
+FULL_SCAN_PATTERNS = {
+    "sqlite": re.compile(r"^SCAN (?P<table>\w+)(?: AS \w+)?$"),
+    "postgresql": re.compile(r"Seq Scan on (?P<table>\w+)"),
+}
+# Sorts of every filtered product, instead of reading them in the index order.
+SORT_PATTERNS = {
+    "sqlite": re.compile(r"^USE TEMP B-TREE FOR (?:LAST \d+ TERMS OF )?ORDER BY$"),
+    "postgresql": re.compile(r"^(?:->\s+)?Sort\s+\(cost"),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Run EXPLAIN for every catalog filter and sort combination, fail if any "
+        "of them falls back to a full table scan and warn about sorts"
+    )
+
+    def add_arguments(self, parser) -> None:
+        """Add the option to fail on sorts."""
+        parser.add_argument(
+            "--fail-on-sorts",
+            action="store_true",
+            help="fail if a query sorts the filtered products without an index",
+        )
+
+    def handle(self, *args: Any, **options: Any) -> Optional[str]:
+        """Check the query plan of every catalog filter and sort combination."""
+        if connection.vendor not in FULL_SCAN_PATTERNS:
+            raise CommandError("Query plans are only checked on SQLite and PostgreSQL.")
+        full_scan_pattern = FULL_SCAN_PATTERNS[connection.vendor]
+        sort_pattern = SORT_PATTERNS[connection.vendor]
+
+        failures = []
+        sorts = []
+        checked = 0
+
+        for query_params in self.get_query_params_combinations():
+            filterset = ProductFilter(
+                data=convert_filters_and_sort_params_product(query_params=query_params),
+                queryset=Product.objects.all(),
+            )
+            if not filterset.is_valid():
+                raise CommandError(
+                    f"Invalid filter combination: {query_params.urlencode()}"
+                )
+
+            plan = self.explain(filterset.qs)
+            full_scans = [line for line in plan if full_scan_pattern.search(line)]
+            sort_lines = [line for line in plan if sort_pattern.search(line)]
+            checked += 1
+
+            if options["verbosity"] > 1:
+                self.stdout.write(query_params.urlencode())
+                for line in plan:
+                    self.stdout.write(f"    {line}")
+
+            if full_scans:
+                failures.append((query_params.urlencode(), full_scans))
+            if sort_lines:
+                sorts.append((query_params.urlencode(), sort_lines))
+
+        for params, plan_lines in failures + sorts:
+            self.stderr.write(f"{params or '<no params>'}: {', '.join(plan_lines)}")
+
+        # The filters by category, tags and name select products that no
+        # index keeps in the sort order, so their sorts are only reported.
+        problems = []
+        if failures:
+            problems.append(
+                f"{len(failures)} of {checked} catalog queries use a full table scan"
+            )
+        if sorts:
+            problems.append(
+                f"{len(sorts)} of {checked} catalog queries sort without an index"
+            )
+        if failures or (sorts and options["fail_on_sorts"]):
+            raise CommandError(f"{'; '.join(problems)}.")
+        if sorts:
+            self.stderr.write(self.style.WARNING(f"{problems[-1]}."))
+            return f"No catalog query uses a full table scan; {problems[-1]}."
+
+        return f"All {checked} catalog queries use indexes."
+
+    @staticmethod
+    def get_query_params_combinations() -> Iterator[QueryDict]:
+        """
+        Generate query parameters for every filter and sort combination. The
+        category and tags filters are only combined when categories and tags
+        exist, as the filters of missing ones do not query the database.
+        """
+        category = Category.objects.values_list("id", flat=True).first()
+        tags = [str(tag_id) for tag_id in Tag.objects.values_list("id", flat=True)[:2]]
+
+        for (
+            name,
+            with_price,
+            free_delivery,
+            available,
+            with_category,
+            with_tags,
+            sort,
+            sort_type,
+        ) in combinations(
+            ("", "phone"),
+            (False, True),
+            ("false", "true"),
+            ("false", "true"),
+            (False, True) if category is not None else (False,),
+            (False, True) if tags else (False,),
+            ("date", "price", "rating", "reviews"),
+            ("dec", "inc"),
+        ):
+            query_params = QueryDict(mutable=True)
+            query_params["filter[name]"] = name
+            query_params["filter[freeDelivery]"] = free_delivery
+            query_params["filter[available]"] = available
+            query_params["sort"] = sort
+            query_params["sortType"] = sort_type
+            if with_price:
+                query_params["filter[minPrice]"] = "100"
+                query_params["filter[maxPrice]"] = "1000"
+            if with_category:
+                query_params["category"] = str(category)
+            if with_tags:
+                query_params.setlist("tags[]", tags)
+            yield query_params
+
+    @staticmethod
+    def explain(queryset) -> List[str]:
+        """
+        Return the lines of the query plan for the queryset. PostgreSQL prefers
+        sequential scans and sorts of small tables even when an index can be
+        used, so they are disabled while the plan is made, which leaves them in
+        the plan only for queries that no index can serve.
+        """
+        sql, params = queryset.query.sql_with_params()
+        if connection.vendor == "sqlite":
+            with connection.cursor() as cursor:
+                cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+                return [row[-1] for row in cursor.fetchall()]
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off")
+            cursor.execute("SET LOCAL enable_sort = off")
+            cursor.execute(f"EXPLAIN {sql}", params)
+            return [row[0].strip() for row in cursor.fetchall()]
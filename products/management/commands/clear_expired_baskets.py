@@ -0,0 +1,21 @@
+from datetime import timedelta
+from typing import Any, Optional
+
+from django.conf import settings
+from django.core.management import BaseCommand
+from django.utils import timezone
+
+from products.baskets import get_basket_store_class
+
+
+class Command(BaseCommand):
+    help = (
+        "Remove the baskets of anonymous users that have not changed for as long "
+        "as a session lives, like clearsessions removes the expired sessions"
+    )
+
+    def handle(self, *args: Any, **options: Any) -> Optional[str]:
+        """Remove the expired anonymous baskets of the basket store."""
+        expired_before = timezone.now() - timedelta(seconds=settings.SESSION_COOKIE_AGE)
+        removed = get_basket_store_class().clear_expired(expired_before)
+        return f"{removed} expired anonymous baskets have been removed."
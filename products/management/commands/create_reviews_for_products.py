@@ -6,7 +6,6 @@ from typing import Any, Optional
 from django.core.management import BaseCommand
 
 from products.models import Product, Review
-from products.services import change_product_rating
 
 
 class Command(BaseCommand):
@@ -31,9 +30,4 @@ class Command(BaseCommand):
                     product=product,
                 )
 
-            change_product_rating(
-                reviews=Review.objects.filter(product=product),
-                product=product,
-            )
-
         return "Random reviews have been generated and product ratings have been updated."
@@ -4,6 +4,7 @@ from typing import Any, Optional
 from django.core.management import BaseCommand
 
 from products.models import Product, ProductSale
+from products.services import refresh_effective_price
 
 
 class Command(BaseCommand):
@@ -35,5 +36,6 @@ class Command(BaseCommand):
                 )
 
         ProductSale.objects.bulk_create(products_sale)
+        refresh_effective_price(Product.objects.filter(sale__isnull=False))
 
         return "Random product sales have been created."
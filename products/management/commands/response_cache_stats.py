@@ -0,0 +1,31 @@
+from typing import Any, Optional
+
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+
+from products.cache import get_response_cache_stats
+
+
+class Command(BaseCommand):
+    help = "Show the number of response cache hits and misses per endpoint"
+
+    def handle(self, *args: Any, **options: Any) -> Optional[str]:
+        """Print the response cache hits, misses and hit ratio of every endpoint."""
+        if settings.CACHES["default"]["BACKEND"].endswith("LocMemCache"):
+            # The counters of the server are in its own memory, out of reach.
+            raise CommandError(
+                "The local-memory cache is private to every process, set "
+                "CACHE_BACKEND=file for the server and this command."
+            )
+
+        stats = get_response_cache_stats()
+        if not stats:
+            return "No cached responses yet."
+
+        self.stdout.write(f"{'endpoint':<12}{'hits':>10}{'misses':>10}{'hit ratio':>12}")
+        for name, counters in stats.items():
+            total = counters["hits"] + counters["misses"]
+            ratio = counters["hits"] / total if total else 0
+            self.stdout.write(
+                f"{name:<12}{counters['hits']:>10}{counters['misses']:>10}{ratio:>12.1%}"
+            )
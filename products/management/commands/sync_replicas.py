@@ -0,0 +1,65 @@
+import sqlite3
+from contextlib import closing
+from typing import Any, Optional
+
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+
+class Command(BaseCommand):
+    help = (
+        "Copy the primary database to the read replicas from DATABASE_REPLICAS, "
+        "to try the replica routing locally without database replication"
+    )
+
+    def handle(self, *args: Any, **options: Any) -> Optional[str]:
+        """Copy the primary database over every replica."""
+        if not settings.DATABASE_REPLICAS:
+            raise CommandError("No read replicas are configured in DATABASE_REPLICAS.")
+
+        primary = connections[DEFAULT_DB_ALIAS]
+        if primary.vendor not in ("sqlite", "postgresql"):
+            raise CommandError("Replicas can only be copied on SQLite and PostgreSQL.")
+
+        for alias in settings.DATABASE_REPLICAS:
+            replica = connections[alias]
+            replica.close()
+            if primary.vendor == "sqlite":
+                self.copy_sqlite(primary, replica)
+            else:
+                self.copy_postgresql(primary, replica)
+            self.stdout.write(f"Copied the primary database to {alias}.")
+        return "The replicas are up to date."
+
+    @staticmethod
+    def copy_sqlite(primary, replica) -> None:
+        """Copy the primary SQLite file over the replica file with the backup API."""
+        primary.ensure_connection()
+        with closing(sqlite3.connect(replica.settings_dict["NAME"])) as target:
+            primary.connection.backup(target)
+
+    @staticmethod
+    def copy_postgresql(primary, replica) -> None:
+        """
+        Recreate the replica database from the primary database as a template.
+        PostgreSQL copies a database only while nobody else is connected to it,
+        so running servers have to be stopped first.
+        """
+        if (replica.settings_dict["HOST"], replica.settings_dict["PORT"]) != (
+            primary.settings_dict["HOST"],
+            primary.settings_dict["PORT"],
+        ):
+            raise CommandError(
+                f"{replica.alias} is on another server, fill it by replication instead."
+            )
+
+        replica_name = primary.ops.quote_name(replica.settings_dict["NAME"])
+        primary_name = primary.ops.quote_name(primary.settings_dict["NAME"])
+        primary.close()
+        try:
+            with primary._nodb_cursor() as cursor:
+                cursor.execute(f"DROP DATABASE IF EXISTS {replica_name} WITH (FORCE)")
+                cursor.execute(f"CREATE DATABASE {replica_name} TEMPLATE {primary_name}")
+        except DatabaseError as error:
+            raise CommandError(f"Could not copy the primary database: {error}")
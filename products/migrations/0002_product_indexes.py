@@ -0,0 +1,40 @@
+# Generated by Django 4.2.3 on 2026-10-18 19:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("products", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                fields=["category", "price"], name="products_category_price_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                fields=["freeDelivery", "price"], name="products_delivery_price_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(fields=["count"], name="products_count_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(fields=["-date"], name="products_date_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(fields=["-rating"], name="products_rating_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="productsale",
+            index=models.Index(fields=["salePrice"], name="products_sale_price_idx"),
+        ),
+    ]
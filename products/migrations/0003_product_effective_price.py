@@ -0,0 +1,58 @@
+# Generated by Django 4.2.3 on 2026-10-18 19:08
+
+from django.db import migrations, models
+from django.db.models import F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_effective_price(apps, schema_editor):
+    """Set the effective price of existing products from their sale."""
+    Product = apps.get_model("products", "Product")
+    ProductSale = apps.get_model("products", "ProductSale")
+    sale_price = ProductSale.objects.filter(product=OuterRef("pk")).values("salePrice")[
+        :1
+    ]
+    Product.objects.update(effective_price=Coalesce(Subquery(sale_price), F("price")))
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("products", "0002_product_indexes"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="product",
+            name="products_category_price_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="product",
+            name="products_delivery_price_idx",
+        ),
+        migrations.AddField(
+            model_name="product",
+            name="effective_price",
+            field=models.DecimalField(
+                decimal_places=2, default=0, editable=False, max_digits=10
+            ),
+        ),
+        migrations.RunPython(fill_effective_price, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                fields=["category", "effective_price"],
+                name="products_category_eprice_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                fields=["freeDelivery", "effective_price"],
+                name="products_delivery_eprice_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(fields=["effective_price"], name="products_eprice_idx"),
+        ),
+    ]
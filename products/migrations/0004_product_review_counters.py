@@ -0,0 +1,48 @@
+# Generated by Django 4.2.3 on 2026-10-18 19:09
+
+from django.db import migrations, models
+from django.db.models import Count, F, FloatField, OuterRef, Subquery, Sum
+from django.db.models.functions import Cast, Coalesce, NullIf, Round
+
+
+def fill_review_counters(apps, schema_editor):
+    """Set the review counters and rating of existing products from their reviews."""
+    Product = apps.get_model("products", "Product")
+    Review = apps.get_model("products", "Review")
+    reviews = Review.objects.filter(product=OuterRef("pk")).order_by().values("product")
+    Product.objects.update(
+        reviews_count=Coalesce(
+            Subquery(reviews.annotate(count=Count("id")).values("count")), 0
+        ),
+        rating_sum=Coalesce(
+            Subquery(reviews.annotate(total=Sum("rate")).values("total")), 0
+        ),
+    )
+    average = Cast(F("rating_sum"), FloatField()) / NullIf(F("reviews_count"), 0)
+    Product.objects.update(rating=Round(Coalesce(average, 0.0), 1))
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("products", "0003_product_effective_price"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="product",
+            name="rating_sum",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="product",
+            name="reviews_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_review_counters, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                fields=["-reviews_count"], name="products_reviews_count_idx"
+            ),
+        ),
+    ]
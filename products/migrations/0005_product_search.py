@@ -0,0 +1,96 @@
+# Generated by Django 4.2.3 on 2026-10-18 19:12
+
+from django.db import migrations
+
+# The SQL is copied here as it was when the migration was written, so that
+# later changes of products.search do not change the migration.
+SQLITE_SEARCH_SQL = (
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS products_search USING fts5(
+        title,
+        description,
+        fullDescription,
+        content='products',
+        content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS products_search_insert AFTER INSERT ON products BEGIN
+        INSERT INTO products_search(rowid, title, description, fullDescription)
+        VALUES (new.id, new.title, new.description, new.fullDescription);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS products_search_delete AFTER DELETE ON products BEGIN
+        INSERT INTO products_search(products_search, rowid, title, description,
+                                    fullDescription)
+        VALUES ('delete', old.id, old.title, old.description, old.fullDescription);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS products_search_update
+    AFTER UPDATE OF title, description, fullDescription ON products BEGIN
+        INSERT INTO products_search(products_search, rowid, title, description,
+                                    fullDescription)
+        VALUES ('delete', old.id, old.title, old.description, old.fullDescription);
+        INSERT INTO products_search(rowid, title, description, fullDescription)
+        VALUES (new.id, new.title, new.description, new.fullDescription);
+    END
+    """,
+    "INSERT INTO products_search(products_search, rank) "
+    "VALUES ('rank', 'bm25(10.0, 2.0, 1.0)')",
+    "INSERT INTO products_search(products_search) VALUES ('rebuild')",
+)
+SQLITE_DROP_SEARCH_SQL = (
+    "DROP TRIGGER IF EXISTS products_search_insert",
+    "DROP TRIGGER IF EXISTS products_search_delete",
+    "DROP TRIGGER IF EXISTS products_search_update",
+    "DROP TABLE IF EXISTS products_search",
+)
+
+POSTGRES_SEARCH_SQL = (
+    """
+    CREATE INDEX IF NOT EXISTS products_search_idx ON products USING gin ((
+        setweight(to_tsvector('simple', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce(description, '')), 'B') ||
+        setweight(to_tsvector('simple', coalesce("fullDescription", '')), 'C')
+    ))
+    """,
+)
+POSTGRES_DROP_SEARCH_SQL = ("DROP INDEX IF EXISTS products_search_idx",)
+
+SEARCH_SQL = {
+    "sqlite": (SQLITE_SEARCH_SQL, SQLITE_DROP_SEARCH_SQL),
+    "postgresql": (POSTGRES_SEARCH_SQL, POSTGRES_DROP_SEARCH_SQL),
+}
+
+
+def execute_search_sql(schema_editor, drop):
+    """Execute the SQL of the search index for the database, if it supports one."""
+    vendor_sql = SEARCH_SQL.get(schema_editor.connection.vendor)
+    if vendor_sql is None:
+        return
+    create_sql, drop_sql = vendor_sql
+    for sql in drop_sql if drop else create_sql:
+        schema_editor.execute(sql)
+
+
+def create_product_search(apps, schema_editor):
+    """Create the full-text search index over products and fill it."""
+    execute_search_sql(schema_editor, drop=False)
+
+
+def drop_product_search(apps, schema_editor):
+    """Drop the full-text search index over products."""
+    execute_search_sql(schema_editor, drop=True)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("products", "0004_product_review_counters"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_product_search, drop_product_search),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 4.2.3 on 2026-10-18 19:15
+
+from django.db import migrations, models
+
+PATH_SEGMENT_LENGTH = 10
+
+
+def fill_category_paths(apps, schema_editor):
+    """Set the materialized paths of existing categories."""
+    Category = apps.get_model("products", "Category")
+    parents = dict(Category.objects.values_list("id", "category_id"))
+    paths = {}
+
+    def get_path(category_id, visited=()):
+        if category_id not in paths:
+            parent_id = parents[category_id]
+            parent_path = ""
+            if parent_id is not None and parent_id not in visited:
+                parent_path = get_path(parent_id, visited + (category_id,))
+            paths[category_id] = f"{parent_path}{category_id:0{PATH_SEGMENT_LENGTH}d}"
+        return paths[category_id]
+
+    for category_id in parents:
+        Category.objects.filter(pk=category_id).update(path=get_path(category_id))
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("products", "0005_product_search"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="category",
+            name="path",
+            field=models.CharField(
+                db_index=True, default="", editable=False, max_length=255
+            ),
+        ),
+        migrations.RunPython(fill_category_paths, migrations.RunPython.noop),
+    ]
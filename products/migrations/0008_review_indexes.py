@@ -0,0 +1,24 @@
+# Generated by Django 4.2.3 on 2026-10-18 19:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("products", "0007_product_updated_at"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="review",
+            index=models.Index(
+                fields=["product", "-date"], name="products_review_date_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="review",
+            index=models.Index(
+                fields=["product", "rate"], name="products_review_rate_idx"
+            ),
+        ),
+    ]
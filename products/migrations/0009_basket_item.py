@@ -0,0 +1,46 @@
+# Generated by Django 4.2.3 on 2026-10-18 19:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("products", "0008_review_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="BasketItem",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("basket_id", models.CharField(max_length=64)),
+                ("count", models.PositiveIntegerField()),
+                (
+                    "product",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="products.product",
+                    ),
+                ),
+            ],
+            options={
+                "db_table": "products_basket_items",
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="basketitem",
+            constraint=models.UniqueConstraint(
+                fields=("basket_id", "product"), name="products_basket_item_unique"
+            ),
+        ),
+    ]
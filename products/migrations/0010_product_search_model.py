@@ -0,0 +1,36 @@
+# Generated by Django 4.2.3 on 2026-10-18 20:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("products", "0009_basket_item"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ProductSearch",
+            fields=[
+                (
+                    "product",
+                    models.OneToOneField(
+                        db_column="rowid",
+                        db_constraint=False,
+                        on_delete=django.db.models.deletion.DO_NOTHING,
+                        primary_key=True,
+                        related_name="search",
+                        serialize=False,
+                        to="products.product",
+                    ),
+                ),
+                ("document", models.TextField(db_column="products_search")),
+                ("rank", models.FloatField()),
+            ],
+            options={
+                "db_table": "products_search",
+                "managed": False,
+            },
+        ),
+    ]
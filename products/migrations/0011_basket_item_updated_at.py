@@ -0,0 +1,17 @@
+# Generated by Django 4.2.3 on 2026-10-18 20:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("products", "0010_product_search_model"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="basketitem",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+    ]
@@ -1,19 +1,33 @@
-from django.db import models
+from django.core.exceptions import ValidationError
+from django.db import models, transaction
+from django.db.models import Max, Value
+from django.db.models.functions import Concat, Length, Substr
+from django.db.models.query import QuerySet
 
 from profiles.models import Profile
 
+CATEGORY_PATH_SEGMENT_LENGTH = 10
+CATEGORY_PATH_MAX_LENGTH = 255
+CATEGORY_MAX_DEPTH = CATEGORY_PATH_MAX_LENGTH // CATEGORY_PATH_SEGMENT_LENGTH
+
 
 class Product(models.Model):
     """Model representing a product."""
 
     title = models.CharField(max_length=128)
     price = models.DecimalField(max_digits=10, decimal_places=2)
+    effective_price = models.DecimalField(
+        max_digits=10, decimal_places=2, default=0, editable=False
+    )
     count = models.PositiveIntegerField(default=0)
     date = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     description = models.TextField(max_length=300, null=False, blank=True)
     fullDescription = models.TextField(max_length=500, null=False, blank=True)
     freeDelivery = models.BooleanField(default=False)
     rating = models.DecimalField(max_digits=2, decimal_places=1, default=0)
+    reviews_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_sum = models.PositiveIntegerField(default=0, editable=False)
     tags = models.ManyToManyField("Tag", related_name="products")
     specifications = models.ManyToManyField("Specification", related_name="products")
     category = models.ForeignKey(
@@ -25,18 +39,49 @@ class Product(models.Model):
 
     class Meta:
         db_table = "products"
+        indexes = (
+            models.Index(
+                fields=("category", "effective_price"),
+                name="products_category_eprice_idx",
+            ),
+            models.Index(
+                fields=("freeDelivery", "effective_price"),
+                name="products_delivery_eprice_idx",
+            ),
+            models.Index(fields=("effective_price",), name="products_eprice_idx"),
+            models.Index(fields=("count",), name="products_count_idx"),
+            models.Index(fields=("-date",), name="products_date_idx"),
+            models.Index(fields=("-rating",), name="products_rating_idx"),
+            models.Index(fields=("-reviews_count",), name="products_reviews_count_idx"),
+        )
 
     def __str__(self) -> str:
         """Return a string representation of the product."""
         return self.title
 
     def save(self, *args, **kwargs) -> None:
-        """Custom save method to ensure a default image is created if none exists."""
+        """
+        Custom save method to keep the effective price in sync with the sale
+        and to ensure a default image is created if none exists.
+        """
+        self.effective_price = self.get_effective_price()
         super().save(*args, **kwargs)
 
         if not self.images.exists():
             ProductImage.objects.create(product=self, alt="default image")
 
+    def get_effective_price(self):
+        """Get the price the product is sold at, taking the sale into account."""
+        if self.pk is not None:
+            sale_price = (
+                ProductSale.objects.filter(product_id=self.pk)
+                .values_list("salePrice", flat=True)
+                .first()
+            )
+            if sale_price is not None:
+                return sale_price
+        return self.price
+
 
 class ProductSale(models.Model):
     """Model representing a product sale."""
@@ -48,6 +93,7 @@ class ProductSale(models.Model):
 
     class Meta:
         db_table = "products_sales"
+        indexes = (models.Index(fields=("salePrice",), name="products_sale_price_idx"),)
 
 
 class Review(models.Model):
@@ -69,6 +115,10 @@ class Review(models.Model):
 
     class Meta:
         db_table = "products_reviews"
+        indexes = (
+            models.Index(fields=("product", "-date"), name="products_review_date_idx"),
+            models.Index(fields=("product", "rate"), name="products_review_rate_idx"),
+        )
 
     def __str__(self) -> str:
         """Return a string representation of the review's author."""
@@ -102,13 +152,29 @@ class Tag(models.Model):
         return self.name
 
 
+def get_category_path_upper_bound(path: str) -> str:
+    """Get the smallest path greater than the paths of a category and its descendants."""
+    parent_path = path[:-CATEGORY_PATH_SEGMENT_LENGTH]
+    last_id = int(path[-CATEGORY_PATH_SEGMENT_LENGTH:])
+    return f"{parent_path}{last_id + 1:0{CATEGORY_PATH_SEGMENT_LENGTH}d}"
+
+
 class Category(models.Model):
-    """Model representing a product category."""
+    """
+    Model representing a product category.
+
+    The path of a category is a materialized path made of the zero-padded ids
+    of its ancestors and its own id, so the category and all its descendants
+    are selected by a single range lookup on the indexed path.
+    """
 
     title = models.CharField(max_length=128)
     category = models.ForeignKey(
         "self", null=True, related_name="subcategory", on_delete=models.SET_NULL
     )
+    path = models.CharField(
+        max_length=CATEGORY_PATH_MAX_LENGTH, db_index=True, editable=False, default=""
+    )
 
     class Meta:
         db_table = "products_categories"
@@ -117,6 +183,23 @@ class Category(models.Model):
         """Return a string representation of the category."""
         return self.title
 
+    def clean(self) -> None:
+        """
+        Validate that the category is not moved into its own subtree and that
+        the categories are not nested deeper than their paths allow.
+        """
+        if self.pk is not None and self.is_in_own_subtree():
+            raise ValidationError(
+                {"category": "A category cannot be a subcategory of itself."}
+            )
+        if self.is_too_deep():
+            raise ValidationError(
+                {
+                    "category": "Categories cannot be nested deeper than "
+                    f"{CATEGORY_MAX_DEPTH} levels."
+                }
+            )
+
     def save(
         self,
         force_insert=False,
@@ -124,12 +207,76 @@ class Category(models.Model):
         using=None,
         update_fields=None,
     ) -> None:
-        """Custom save method to ensure a default image is created if none exists."""
-        super().save(force_insert, force_update, using, update_fields)
+        """
+        Custom save method to maintain the materialized path of the category
+        and to ensure a default image is created if none exists.
+        """
+        if self.pk is not None and self.is_in_own_subtree():
+            raise ValueError("A category cannot be a subcategory of itself.")
+        if self.is_too_deep():
+            raise ValueError(
+                f"Categories cannot be nested deeper than {CATEGORY_MAX_DEPTH} levels."
+            )
+
+        with transaction.atomic(using=using):
+            super().save(force_insert, force_update, using, update_fields)
+            self.update_path()
 
         if not hasattr(self, "image"):
             CategoryImage.objects.create(category=self, alt="default image")
 
+    def is_in_own_subtree(self) -> bool:
+        """Check whether the parent category is the category itself or its descendant."""
+        if self.category_id is None:
+            return False
+        return self.get_descendants().filter(pk=self.category_id).exists()
+
+    def is_too_deep(self) -> bool:
+        """
+        Check whether the category or one of its descendants would be nested
+        deeper than CATEGORY_MAX_DEPTH levels under the parent category.
+        """
+        depth = 1
+        if self.category_id is not None:
+            parent_path = Category.objects.values_list("path", flat=True).get(
+                pk=self.category_id
+            )
+            depth += len(parent_path) // CATEGORY_PATH_SEGMENT_LENGTH
+        if self.pk is not None:
+            stored_path = Category.objects.values_list("path", flat=True).get(pk=self.pk)
+            if stored_path:
+                longest_path = self.get_descendants().aggregate(
+                    length=Max(Length("path"))
+                )["length"]
+                depth += (longest_path - len(stored_path)) // CATEGORY_PATH_SEGMENT_LENGTH
+        return depth > CATEGORY_MAX_DEPTH
+
+    def update_path(self) -> None:
+        """Update the materialized path of the category and of all its descendants."""
+        old_path = Category.objects.values_list("path", flat=True).get(pk=self.pk)
+        parent_path = ""
+        if self.category_id is not None:
+            parent_path = Category.objects.values_list("path", flat=True).get(
+                pk=self.category_id
+            )
+        path = f"{parent_path}{self.pk:0{CATEGORY_PATH_SEGMENT_LENGTH}d}"
+
+        if old_path:
+            Category.objects.filter(
+                path__gt=old_path, path__lt=get_category_path_upper_bound(old_path)
+            ).update(path=Concat(Value(path), Substr("path", len(old_path) + 1)))
+        Category.objects.filter(pk=self.pk).update(path=path)
+        self.path = path
+
+    def get_descendants(self) -> QuerySet:
+        """Get the category and all its descendants."""
+        stored_path = Category.objects.values_list("path", flat=True).get(pk=self.pk)
+        if not stored_path:
+            return Category.objects.filter(pk=self.pk)
+        return Category.objects.filter(
+            path__gte=stored_path, path__lt=get_category_path_upper_bound(stored_path)
+        )
+
 
 def get_product_image_directory_path(instance: Product, filename: str) -> str:
     """Return the directory path for product images."""
@@ -155,6 +302,29 @@ class ProductImage(models.Model):
         db_table = "products_images"
 
 
+class ProductSearch(models.Model):
+    """
+    Row of the SQLite full-text search index of a product. The FTS5 table is
+    created and kept up to date by products.search, so it is not managed.
+    """
+
+    product = models.OneToOneField(
+        Product,
+        on_delete=models.DO_NOTHING,
+        primary_key=True,
+        db_column="rowid",
+        db_constraint=False,
+        related_name="search",
+    )
+    # The hidden column named after the table, matched against the whole row.
+    document = models.TextField(db_column="products_search")
+    rank = models.FloatField()
+
+    class Meta:
+        managed = False
+        db_table = "products_search"
+
+
 class CategoryImage(models.Model):
     """Model representing an image for a product category."""
 
@@ -169,3 +339,24 @@ class CategoryImage(models.Model):
 
     class Meta:
         db_table = "products_category_images"
+
+
+class BasketItem(models.Model):
+    """Model representing the count of a product in a shopping basket."""
+
+    basket_id = models.CharField(max_length=64)
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="+")
+    count = models.PositiveIntegerField()
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        db_table = "products_basket_items"
+        constraints = (
+            models.UniqueConstraint(
+                fields=("basket_id", "product"), name="products_basket_item_unique"
+            ),
+        )
+
+    def __str__(self) -> str:
+        """Return a string representation of the basket item."""
+        return f"{self.basket_id}: {self.product_id} x {self.count}"
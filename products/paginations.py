@@ -1,6 +1,32 @@
-from rest_framework.pagination import PageNumberPagination
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as BinasciiError
+from math import ceil
+
+from asgiref.sync import sync_to_async
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.paginator import InvalidPage, Paginator
+from django.db.models import Q
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, PageNumberPagination
 from rest_framework.response import Response
 
+from products.cache import aget_cached_count, get_cached_count
+
+
+class CachedCountPaginator(Paginator):
+    """Paginator that caches the number of objects under the given key."""
+
+    def __init__(self, *args, count_cache_key=None, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.count_cache_key = count_cache_key
+
+    @cached_property
+    def count(self) -> int:
+        """Get the number of objects from the cache or count them."""
+        return get_cached_count(self.object_list, self.count_cache_key)
+
 
 class ProductPagination(PageNumberPagination):
     """Custom pagination class for the Product API views."""
@@ -10,6 +36,47 @@ class ProductPagination(PageNumberPagination):
     page_query_param = "currentPage"
     max_page_size = 100
 
+    def paginate_queryset(self, queryset, request, view=None):
+        """
+        Paginate the queryset, caching its count when the view provides
+        a cache key with the get_count_cache_key method.
+        """
+        self.count_cache_key = self.get_count_cache_key(view)
+        return super().paginate_queryset(queryset, request, view)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """
+        Paginate the queryset like paginate_queryset, counting the objects and
+        loading the page with the async ORM.
+        """
+        self.request = request
+        self.count_cache_key = self.get_count_cache_key(view)
+        paginator = self.django_paginator_class(queryset, self.get_page_size(request))
+        paginator.count = await aget_cached_count(queryset, self.count_cache_key)
+        page_number = self.get_page_number(request, paginator)
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            raise NotFound(
+                self.invalid_page_message.format(
+                    page_number=page_number, message=str(exc)
+                )
+            )
+        return [item async for item in self.page.object_list]
+
+    @staticmethod
+    def get_count_cache_key(view):
+        """Get the count cache key from the view, or None if it does not cache counts."""
+        if hasattr(view, "get_count_cache_key"):
+            return view.get_count_cache_key()
+        return None
+
+    def django_paginator_class(self, object_list, per_page) -> CachedCountPaginator:
+        """Create a paginator with the count cache key of the current request."""
+        return CachedCountPaginator(
+            object_list, per_page, count_cache_key=self.count_cache_key
+        )
+
     def get_paginated_response(self, data) -> Response:
         """Get the paginated response with additional pagination information."""
         return Response(
@@ -19,3 +86,159 @@ class ProductPagination(PageNumberPagination):
                 "lastPage": self.page.paginator.num_pages,
             }
         )
+
+
+class CatalogPagination(ProductPagination):
+    """
+    Pagination for the catalog that switches to keyset pagination when the
+    request has a cursor query parameter. An empty cursor requests the first
+    page, and every response contains the cursor of the next one.
+
+    In keyset mode a page is selected by the value of the sort column and the
+    id of the last product of the previous page, so deep pages cost as much
+    as the first one. The total number of products is taken on the first
+    page only and carried over in the cursor.
+    """
+
+    cursor_query_param = "cursor"
+    keyset_fields = ("date", "effective_price", "rating", "reviews_count")
+    invalid_cursor_message = "Invalid cursor"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """Paginate the queryset by page number or by cursor."""
+        self.cursor = None
+        keyset_field = self.get_keyset_field(queryset)
+        if self.cursor_query_param not in request.query_params or keyset_field is None:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.count_cache_key = self.get_count_cache_key(view)
+
+        self.request = request
+        self.cursor = self.decode_cursor(request.query_params[self.cursor_query_param])
+        field, descending = keyset_field
+        page_size = self.get_page_size(request)
+
+        if self.cursor["page"] == 1:
+            self.cursor["total"] = get_cached_count(queryset, self.count_cache_key)
+        else:
+            try:
+                value = queryset.model._meta.get_field(field).to_python(
+                    self.cursor["value"]
+                )
+            except (TypeError, ValidationError):
+                raise NotFound(self.invalid_cursor_message)
+
+            lookup = "lt" if descending else "gt"
+            queryset = queryset.filter(
+                Q(**{f"{field}__{lookup}": value})
+                | Q(**{field: value, f"id__{lookup}": self.cursor["id"]})
+            )
+
+        ordering = ("-" if descending else "") + field
+        id_ordering = "-id" if descending else "id"
+        products = list(queryset.order_by(ordering, id_ordering)[: page_size + 1])
+
+        self.next_cursor = None
+        if len(products) > page_size:
+            products = products[:page_size]
+            last_product = products[-1]
+            self.next_cursor = self.encode_cursor(
+                {
+                    "value": last_product._meta.get_field(field).value_to_string(
+                        last_product
+                    ),
+                    "id": last_product.pk,
+                    "page": self.cursor["page"] + 1,
+                    "total": self.cursor["total"],
+                }
+            )
+        self.last_page = max(ceil(self.cursor["total"] / page_size), 1)
+        return products
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """
+        Paginate the queryset by page number with the async ORM, or by cursor
+        in a thread, as the keyset pages take several dependent queries.
+        """
+        self.cursor = None
+        if (
+            self.cursor_query_param not in request.query_params
+            or self.get_keyset_field(queryset) is None
+        ):
+            return await super().apaginate_queryset(queryset, request, view)
+        return await sync_to_async(self.paginate_queryset)(queryset, request, view)
+
+    def get_paginated_response(self, data) -> Response:
+        """Get the paginated response with the cursor of the next page in keyset mode."""
+        if self.cursor is None:
+            return super().get_paginated_response(data)
+
+        return Response(
+            {
+                "items": data,
+                "currentPage": self.cursor["page"],
+                "lastPage": self.last_page,
+                "nextCursor": self.next_cursor,
+            }
+        )
+
+    def get_keyset_field(self, queryset):
+        """
+        Get the sort field of the queryset and whether it is descending,
+        or None if the queryset is not sorted by a keyset field.
+        """
+        ordering = queryset.query.order_by
+        if not ordering or not isinstance(ordering[0], str):
+            return None
+
+        field = ordering[0].lstrip("-")
+        if field not in self.keyset_fields:
+            return None
+
+        try:
+            queryset.model._meta.get_field(field)
+        except FieldDoesNotExist:
+            return None
+        return field, ordering[0].startswith("-")
+
+    def decode_cursor(self, encoded):
+        """Decode the cursor from the query parameters."""
+        if not encoded:
+            return {"page": 1, "total": 0}
+
+        try:
+            cursor = json.loads(urlsafe_b64decode(encoded.encode("ascii")))
+            if not {"value", "id", "page", "total"} <= cursor.keys():
+                raise ValueError
+            if not isinstance(cursor["value"], str):
+                raise ValueError
+            for key in ("id", "page", "total"):
+                if not isinstance(cursor[key], int) or cursor[key] < 1:
+                    raise ValueError
+        except (BinasciiError, UnicodeError, ValueError, AttributeError):
+            raise NotFound(self.invalid_cursor_message)
+        return cursor
+
+    @staticmethod
+    def encode_cursor(cursor) -> str:
+        """Encode the cursor for the query parameters."""
+        return urlsafe_b64encode(json.dumps(cursor).encode("ascii")).decode("ascii")
+
+
+class ReviewPagination(CursorPagination):
+    """Cursor pagination for the reviews of a product, from the latest one."""
+
+    page_size_query_param = "limit"
+    page_size = 10
+    max_page_size = 100
+    ordering = ("-date", "-id")
+
+    def get_paginated_response(self, data) -> Response:
+        """Get the paginated response with the links to the neighbouring pages."""
+        return Response(
+            {
+                "items": data,
+                "next": self.get_next_link(),
+                "previous": self.get_previous_link(),
+            }
+        )
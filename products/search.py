@@ -0,0 +1,226 @@
+import re
+from typing import Optional
+
+from django.db import connections
+from django.db.models import BooleanField, F, FloatField, Func, Lookup, Value
+from django.db.models.query import QuerySet
+
+from products.models import ProductSearch
+
+SEARCH_TABLE = "products_search"
+
+# Title matches weigh more than description matches, which weigh more than
+# matches in the full description.
+SEARCH_RANK = "bm25(10.0, 2.0, 1.0)"
+
+SQLITE_SEARCH_TABLE_SQL = f"""
+CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5(
+    title,
+    description,
+    fullDescription,
+    content='products',
+    content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2'
+)
+"""
+
+# Django rebuilds the products table on SQLite when some fields are altered,
+# which drops these triggers, so they are recreated after every migration.
+SQLITE_SEARCH_TRIGGERS_SQL = (
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_insert AFTER INSERT ON products BEGIN
+        INSERT INTO {SEARCH_TABLE}(rowid, title, description, fullDescription)
+        VALUES (new.id, new.title, new.description, new.fullDescription);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_delete AFTER DELETE ON products BEGIN
+        INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, title, description,
+                                   fullDescription)
+        VALUES ('delete', old.id, old.title, old.description, old.fullDescription);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_update
+    AFTER UPDATE OF title, description, fullDescription ON products BEGIN
+        INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, title, description,
+                                   fullDescription)
+        VALUES ('delete', old.id, old.title, old.description, old.fullDescription);
+        INSERT INTO {SEARCH_TABLE}(rowid, title, description, fullDescription)
+        VALUES (new.id, new.title, new.description, new.fullDescription);
+    END
+    """,
+)
+
+# PostgreSQL searches an expression over the products table instead, which is
+# indexed with GIN. Queries must use the same expression as the index, so it
+# is kept in one place. Weights A, B and C rank title matches above matches
+# in the descriptions.
+POSTGRES_SEARCH_INDEX = "products_search_idx"
+POSTGRES_SEARCH_VECTOR_SQL = (
+    "setweight(to_tsvector('simple', coalesce({title}, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce({description}, '')), 'B') || "
+    "setweight(to_tsvector('simple', coalesce({full_description}, '')), 'C')"
+)
+POSTGRES_SEARCH_INDEX_SQL = (
+    f"CREATE INDEX IF NOT EXISTS {POSTGRES_SEARCH_INDEX} ON products USING gin (("
+    + POSTGRES_SEARCH_VECTOR_SQL.format(
+        title="title", description="description", full_description='"fullDescription"'
+    )
+    + "))"
+)
+
+
+def create_search_index(schema_connection, rebuild=False) -> None:
+    """Create the full-text search index over products if the database supports it."""
+    if schema_connection.vendor == "postgresql":
+        with schema_connection.cursor() as cursor:
+            cursor.execute(POSTGRES_SEARCH_INDEX_SQL)
+        return
+    if schema_connection.vendor != "sqlite":
+        return
+
+    with schema_connection.cursor() as cursor:
+        cursor.execute(SQLITE_SEARCH_TABLE_SQL)
+        for trigger_sql in SQLITE_SEARCH_TRIGGERS_SQL:
+            cursor.execute(trigger_sql)
+        cursor.execute(
+            f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rank) VALUES ('rank', %s)",
+            (SEARCH_RANK,),
+        )
+        if rebuild:
+            cursor.execute(
+                f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}) VALUES ('rebuild')"
+            )
+
+
+def drop_search_index(schema_connection) -> None:
+    """Drop the full-text search index over products."""
+    if schema_connection.vendor == "postgresql":
+        with schema_connection.cursor() as cursor:
+            cursor.execute(f"DROP INDEX IF EXISTS {POSTGRES_SEARCH_INDEX}")
+        return
+    if schema_connection.vendor != "sqlite":
+        return
+
+    with schema_connection.cursor() as cursor:
+        for suffix in ("insert", "delete", "update"):
+            cursor.execute(f"DROP TRIGGER IF EXISTS {SEARCH_TABLE}_{suffix}")
+        cursor.execute(f"DROP TABLE IF EXISTS {SEARCH_TABLE}")
+
+
+_search_index_databases = set()
+
+
+def is_search_index_available(using="default") -> bool:
+    """Check whether the full-text search index exists in the database."""
+    if using in _search_index_databases:
+        return True
+
+    search_connection = connections[using]
+    if search_connection.vendor == "sqlite":
+        available = SEARCH_TABLE in search_connection.introspection.table_names()
+    elif search_connection.vendor == "postgresql":
+        with search_connection.cursor() as cursor:
+            available = POSTGRES_SEARCH_INDEX in (
+                search_connection.introspection.get_constraints(cursor, "products")
+            )
+    else:
+        available = False
+
+    if available:
+        _search_index_databases.add(using)
+    return available
+
+
+def get_match_expression(query: str) -> Optional[str]:
+    """Convert a user query into an FTS5 expression matching every word as a prefix."""
+    words = re.findall(r"\w+", query)
+    if not words:
+        return None
+    return " ".join(f'"{word}"*' for word in words)
+
+
+def get_tsquery(query: str) -> Optional[str]:
+    """Convert a user query into a PostgreSQL tsquery matching every word as a prefix."""
+    words = re.findall(r"\w+", query)
+    if not words:
+        return None
+    return " & ".join(f"{word}:*" for word in words)
+
+
+class Match(Lookup):
+    """Whether the FTS5 table of the column matches a match expression."""
+
+    lookup_name = "match"
+
+    def as_sql(self, compiler, connection):
+        """Render the MATCH operator of FTS5."""
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f"{lhs} MATCH {rhs}", lhs_params + rhs_params
+
+
+ProductSearch._meta.get_field("document").register_lookup(Match)
+
+
+class TextSearchFunc(Func):
+    """
+    Base class of PostgreSQL full-text search expressions over the indexed
+    search vector of products and a tsquery.
+    """
+
+    template = None
+
+    def __init__(self, tsquery: str, **extra) -> None:
+        super().__init__(
+            F("title"), F("description"), F("fullDescription"), Value(tsquery), **extra
+        )
+
+    def as_sql(self, compiler, connection, **extra_context):
+        """Render the template with the search vector and the tsquery."""
+        (title, _), (description, _), (full_description, _), (tsquery, params) = (
+            compiler.compile(expression) for expression in self.get_source_expressions()
+        )
+        vector = POSTGRES_SEARCH_VECTOR_SQL.format(
+            title=title, description=description, full_description=full_description
+        )
+        return self.template.format(vector=vector, tsquery=tsquery), params
+
+
+class TextSearchMatch(TextSearchFunc):
+    """Whether a product matches a tsquery."""
+
+    template = "({vector}) @@ to_tsquery('simple', {tsquery})"
+    output_field = BooleanField()
+
+
+class TextSearchRank(TextSearchFunc):
+    """
+    Relevance of a product for a tsquery, negated like the FTS5 rank, so that
+    lower values mean more relevant products.
+    """
+
+    template = "-ts_rank({vector}, to_tsquery('simple', {tsquery}))"
+    output_field = FloatField()
+
+
+def search_products(queryset: QuerySet, query: str) -> QuerySet:
+    """Filter products by a full-text query and annotate them with a search_rank."""
+    if connections[queryset.db].vendor == "postgresql":
+        tsquery = get_tsquery(query)
+        if tsquery is None or not is_search_index_available(queryset.db):
+            return queryset.filter(title__icontains=query)
+        return queryset.filter(TextSearchMatch(tsquery)).annotate(
+            search_rank=TextSearchRank(tsquery)
+        )
+
+    match_expression = get_match_expression(query)
+    if match_expression is None or not is_search_index_available(queryset.db):
+        return queryset.filter(title__icontains=query)
+
+    # The products are joined with their rows of the index, whose rank is the
+    # relevance computed while matching, where lower values are more relevant.
+    return queryset.filter(search__document__match=match_expression).annotate(
+        search_rank=F("search__rank")
+    )
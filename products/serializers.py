@@ -1,8 +1,15 @@
+from typing import Dict
+
+from django.db.models import Count
 from rest_framework import serializers
 
+from products.baskets import ADD, BASKET_ACTIONS, REMOVE, BasketOperation
 from products.models import (Category, CategoryImage, Product, ProductImage,
                              ProductSale, Review, Specification, Tag)
 
+REVIEW_RATES = range(1, 6)
+MAX_BASKET_OPERATIONS = 100
+
 
 class ProductImageSerializer(serializers.ModelSerializer):
     """Serializer for the ProductImage model."""
@@ -44,8 +51,7 @@ class CategorySerializer(serializers.ModelSerializer):
 
     def get_subcategories(self, obj):
         """Get the subcategories of the category."""
-        queryset = Category.objects.filter(category=obj.pk)
-        serializer = SubcategorySerializer(queryset, many=True)
+        serializer = SubcategorySerializer(obj.subcategory.all(), many=True)
         return serializer.data
 
 
@@ -80,6 +86,14 @@ class ReviewSerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
 
+class ProductRatingSerializer(serializers.ModelSerializer):
+    """Serializer for the rating of a product, like in ProductSerializer."""
+
+    class Meta:
+        model = Product
+        fields = ("rating", "reviews_count")
+
+
 class SpecificationSerializer(serializers.ModelSerializer):
     """Serializer for the Specification model."""
 
@@ -102,28 +116,53 @@ class ProductShortSerializer(serializers.ModelSerializer):
     price = serializers.SerializerMethodField()
     images = ProductImageSerializer(many=True, read_only=True)
     tags = TagSerializer(many=True, read_only=True)
-    reviews = serializers.PrimaryKeyRelatedField(many=True, read_only=True)
+    reviews = serializers.IntegerField(source="reviews_count", read_only=True)
 
     class Meta:
         model = Product
-        exclude = ("fullDescription", "specifications")
+        fields = (
+            "id",
+            "price",
+            "images",
+            "tags",
+            "reviews",
+            "title",
+            "count",
+            "date",
+            "description",
+            "freeDelivery",
+            "rating",
+            "category",
+        )
 
     def get_price(self, obj) -> float:
-        """Get the price of the product, but first check if there is a discount"""
-        if hasattr(obj, "sale"):
-            return obj.sale.salePrice
-        return obj.price
+        """Get the price of the product, taking the discount into account."""
+        return obj.effective_price
 
 
 class ProductSerializer(ProductShortSerializer):
-    """Serializer for the full representation of the Product model."""
+    """
+    Serializer for the full representation of the Product model, with the
+    latest reviews and the number of reviews for every rate.
+    """
 
-    reviews = ReviewSerializer(many=True, read_only=True)
+    reviews = ReviewSerializer(source="latest_reviews", many=True, read_only=True)
+    rating_histogram = serializers.SerializerMethodField()
     specifications = SpecificationSerializer(many=True, read_only=True)
 
     class Meta:
         model = Product
-        fields = "__all__"
+        fields = ProductShortSerializer.Meta.fields + (
+            "rating_histogram",
+            "reviews_count",
+            "specifications",
+            "fullDescription",
+        )
+
+    def get_rating_histogram(self, obj) -> Dict[int, int]:
+        """Get the number of reviews of the product for every rate."""
+        counts = dict(obj.reviews.order_by().values_list("rate").annotate(Count("id")))
+        return {rate: counts.get(rate, 0) for rate in REVIEW_RATES}
 
 
 class ProductSaleSerializer(serializers.ModelSerializer):
@@ -146,3 +185,47 @@ class ProductSaleSerializer(serializers.ModelSerializer):
             "price",
             "images",
         )
+
+
+class BasketOperationSerializer(serializers.Serializer):
+    """Serializer for a change of the count of a product in the basket."""
+
+    action = serializers.ChoiceField(choices=BASKET_ACTIONS, default=ADD)
+    id = serializers.IntegerField()
+    count = serializers.IntegerField(min_value=0, default=1)
+
+    def to_internal_value(self, data) -> BasketOperation:
+        """Convert the operation data into a basket operation."""
+        validated_data = super().to_internal_value(data)
+        return BasketOperation(
+            validated_data["action"], validated_data["id"], validated_data["count"]
+        )
+
+
+class BasketBatchSerializer(serializers.Serializer):
+    """Serializer for a list of changes of the basket applied together."""
+
+    operations = BasketOperationSerializer(
+        many=True, allow_empty=False, max_length=MAX_BASKET_OPERATIONS
+    )
+
+    def validate_operations(self, operations):
+        """
+        Validate that the products added to the basket exist. Removing a product
+        or setting its count to zero is skipped if the product is not in the
+        basket, so those products are not checked.
+        """
+        product_ids = {
+            operation.product_id
+            for operation in operations
+            if operation.action != REMOVE and operation.count > 0
+        }
+        existing_ids = set(
+            Product.objects.filter(pk__in=product_ids).values_list("id", flat=True)
+        )
+        missing_ids = product_ids - existing_ids
+        if missing_ids:
+            raise serializers.ValidationError(
+                f"Products not found: {', '.join(map(str, sorted(missing_ids)))}."
+            )
+        return operations
@@ -1,15 +1,134 @@
-from typing import Dict
+import random
+from array import array
+from datetime import datetime
+from hashlib import md5
+from typing import Callable, Dict, List, Optional
 
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Case, F, OuterRef, Prefetch, Q, Subquery, When
+from django.db.models.aggregates import Count, Max, Min, Sum
+from django.db.models.expressions import Combinable
+from django.db.models.fields import FloatField, PositiveIntegerField
+from django.db.models.functions import Cast, Coalesce, NullIf, Round
 from django.db.models.query import QuerySet
+from django.http import Http404
+from django.utils import timezone
 
-from products.models import Product
+from config.routers import primary_pinning
+from products import cache as catalog_cache
+from products.baskets import get_basket
+from products.filters import ProductFilter
+from products.models import Category, Product, ProductSale, Review, Tag
 
+FACETS_CACHE_TIMEOUT = 60 * 10
+LATEST_REVIEWS_COUNT = 5
+PRICE_HISTOGRAM_BUCKETS = 10
+BANNERS_COUNT = 5
+BANNER_POOL_VERSION_KEY = "banners:version"
+BANNER_POOL_TIMEOUT = 60 * 10
 
-def get_total_price_product(product, count) -> float:
-    """Calculate the total price for a product based on its quantity."""
-    if hasattr(product, "sale"):
-        return product.sale.salePrice * count
-    return product.price * count
+
+def get_product_card_queryset() -> QuerySet[Product]:
+    """
+    Get a queryset of products with all relations used by ProductShortSerializer,
+    so that a page of product cards costs a fixed number of queries. The reviews
+    are shown by their counter, so they are not loaded.
+    """
+    return Product.objects.prefetch_related("images", "tags")
+
+
+def get_product_detail_queryset() -> QuerySet[Product]:
+    """
+    Get a queryset of products with all relations used by ProductSerializer.
+    Only the latest reviews are loaded, so the cost of a product detail does
+    not depend on the number of its reviews.
+    """
+    return Product.objects.select_related("sale").prefetch_related(
+        "images",
+        "tags",
+        Prefetch(
+            "reviews",
+            queryset=Review.objects.order_by("-date", "-id")[:LATEST_REVIEWS_COUNT],
+            to_attr="latest_reviews",
+        ),
+        "specifications",
+    )
+
+
+def build_banner_pool() -> array:
+    """Build the pool of ids of products that can be shown as banners."""
+    return array("q", Product.objects.order_by().values_list("id", flat=True))
+
+
+banner_pool_cache = catalog_cache.VersionedLocalCache(
+    BANNER_POOL_VERSION_KEY, build_banner_pool, timeout=BANNER_POOL_TIMEOUT
+)
+
+
+def get_banner_products(
+    queryset: QuerySet[Product], count=BANNERS_COUNT
+) -> List[Product]:
+    """
+    Get random products for banners. The ids are sampled from a pool kept in
+    process memory, so the products table is not sorted randomly on every request.
+    """
+    pool = banner_pool_cache.get()
+    product_ids = random.sample(pool, min(count, len(pool)))
+    products = {product.pk: product for product in queryset.filter(pk__in=product_ids)}
+    return [products[product_id] for product_id in product_ids if product_id in products]
+
+
+def get_product_last_modified(request, pk) -> Optional[datetime]:
+    """Get the time of the last change of a product, querying it once per request."""
+    if not hasattr(request, "product_updated_at"):
+        try:
+            request.product_updated_at = (
+                Product.objects.filter(pk=pk).values_list("updated_at", flat=True).first()
+            )
+        except ValueError:
+            request.product_updated_at = None
+    return request.product_updated_at
+
+
+def get_product_etag(request, pk) -> Optional[str]:
+    """
+    Get the ETag of a product detail response from the time of the last change
+    of the product and the catalog version, without serializing the product.
+    """
+    updated_at = get_product_last_modified(request, pk)
+    if updated_at is None:
+        return None
+    return make_product_etag(pk, updated_at)
+
+
+def make_product_etag(pk, updated_at: datetime) -> str:
+    """Make the ETag of a product detail response from the time of the last change."""
+    catalog_version = catalog_cache.get_catalog_version()
+    return f"product-{pk}-{updated_at.timestamp()}-{catalog_version}"
+
+
+def get_catalog_etag(request) -> str:
+    """Get the ETag of a catalog response from the data versions and the query."""
+    digest = md5(request.get_full_path().encode()).hexdigest()
+    catalog_version = catalog_cache.get_catalog_version()
+    stock_version = catalog_cache.get_stock_version()
+    return f"catalog-{catalog_version}-{stock_version}-{digest}"
+
+
+def touch_products(products: QuerySet[Product]) -> None:
+    """Mark the products as changed, so that their details are not taken as unmodified."""
+    products.update(updated_at=timezone.now())
+
+
+def refresh_effective_price(products: QuerySet[Product]) -> int:
+    """Recalculate the effective price of products from their current sale."""
+    sale_price = Subquery(
+        ProductSale.objects.filter(product=OuterRef("pk")).values("salePrice")[:1]
+    )
+    return products.update(
+        effective_price=Coalesce(sale_price, F("price")), updated_at=timezone.now()
+    )
 
 
 def convert_filters_and_sort_params_product(query_params) -> Dict:
@@ -17,82 +136,311 @@ def convert_filters_and_sort_params_product(query_params) -> Dict:
     return {
         "name": query_params.get("filter[name]", ""),
         "min_price": query_params.get("filter[minPrice]", 0),
-        "max_price": query_params.get("filter[maxPrice]", 50000),
+        "max_price": query_params.get("filter[maxPrice]", None),
         "free_delivery": bool(
             query_params.get("filter[freeDelivery]", "false") == "true"
         ),
         "available": bool(query_params.get("filter[available]", "false") == "true"),
         "category": query_params.get("category", None),
         "tags": query_params.getlist("tags[]", []),
-        "sort_by": query_params.get("sort", "date"),
+        "sort_by": query_params.get(
+            "sort", "relevance" if query_params.get("filter[name]") else "date"
+        ),
         "sort_type": query_params.get("sortType", "dec"),
     }
 
 
-def change_product_rating(product, reviews) -> None:
-    """Change the rating of a product based on reviews."""
-    rates = [review.rate for review in reviews]
-    product.rating = sum(rates) / len(rates)
-    product.save()
+def filter_catalog(queryset: QuerySet[Product], filter_params) -> QuerySet[Product]:
+    """Filter and sort the catalog products, ignoring invalid parameters."""
+    filterset = ProductFilter(data=filter_params, queryset=queryset)
+    if filterset.is_valid():
+        return filterset.qs
+    return queryset
+
+
+def is_valid_catalog_filter(filter_params) -> bool:
+    """Check whether the catalog filter parameters are valid."""
+    return ProductFilter(data=filter_params, queryset=Product.objects.none()).is_valid()
+
+
+def get_catalog_filter_params(filter_params) -> Dict:
+    """Get the catalog filter parameters without the sorting ones."""
+    return {
+        key: value
+        for key, value in filter_params.items()
+        if key not in ("sort_by", "sort_type")
+    }
+
+
+def get_catalog_count_cache_key(filter_params) -> Optional[str]:
+    """
+    Get the cache key for the number of products matching the filter
+    parameters. Invalid parameters get no key, so their count is not cached.
+    """
+    if not is_valid_catalog_filter(filter_params):
+        return None
+    return catalog_cache.make_catalog_cache_key(
+        "count", get_catalog_filter_params(filter_params)
+    )
+
 
+def get_catalog_facets(filter_params) -> Dict:
+    """
+    Get the catalog facets for the filter parameters, computing them once per
+    filter. Invalid parameters are ignored, like when filtering the catalog.
+    """
+    if not is_valid_catalog_filter(filter_params):
+        filter_params = {}
+    cache_key = catalog_cache.make_catalog_cache_key(
+        "facets", get_catalog_filter_params(filter_params)
+    )
+    facets = cache.get(cache_key)
+    if facets is None:
+        with primary_pinning(True):
+            facets = calculate_catalog_facets(filter_params)
+        cache.set(cache_key, facets, FACETS_CACHE_TIMEOUT)
+    return facets
 
-def change_product_count(product, count_to_subtract) -> None:
-    """Change the count of a product by subtracting the specified amount."""
-    product.count -= count_to_subtract
-    product.save()
+
+def calculate_catalog_facets(filter_params) -> Dict:
+    """
+    Calculate the number of filtered products per tag and per category, and
+    the price range with a price histogram. The price facet ignores the price
+    filters, so that it describes every price the user can choose from.
+    """
+    products = ProductFilter(data=filter_params, queryset=Product.objects.all()).qs
+    products_in_price_range = ProductFilter(
+        data={**filter_params, "min_price": None, "max_price": None},
+        queryset=Product.objects.all(),
+    ).qs
+    product_ids = products.order_by().values("id")
+
+    tags = (
+        Tag.objects.filter(products__in=product_ids)
+        .annotate(count=Count("products"))
+        .values("id", "name", "count")
+        .order_by("id")
+    )
+    categories = (
+        Category.objects.filter(products__in=product_ids)
+        .annotate(count=Count("products"))
+        .values("id", "title", "count")
+        .order_by("id")
+    )
+    return {
+        "tags": list(tags),
+        "categories": list(categories),
+        "price": get_price_histogram(products_in_price_range.order_by()),
+    }
+
+
+def get_price_histogram(products: QuerySet[Product]) -> Dict:
+    """Get the price range of products and the number of products per price bucket."""
+    price_range = products.aggregate(
+        min=Min("effective_price"), max=Max("effective_price")
+    )
+    min_price, max_price = price_range["min"], price_range["max"]
+    if min_price is None:
+        return {"min": None, "max": None, "histogram": []}
+
+    step = (max_price - min_price) / PRICE_HISTOGRAM_BUCKETS
+    if not step:
+        return {
+            "min": min_price,
+            "max": max_price,
+            "histogram": [
+                {"from": min_price, "to": max_price, "count": products.count()}
+            ],
+        }
+
+    bounds = [
+        (min_price + step * number, min_price + step * (number + 1))
+        for number in range(PRICE_HISTOGRAM_BUCKETS)
+    ]
+    bounds[-1] = (bounds[-1][0], max_price)
+    counts = products.aggregate(
+        **{
+            f"bucket_{number}": Count(
+                "id",
+                filter=Q(effective_price__gte=lower)
+                & (
+                    Q(effective_price__lte=upper)
+                    if number == PRICE_HISTOGRAM_BUCKETS - 1
+                    else Q(effective_price__lt=upper)
+                ),
+            )
+            for number, (lower, upper) in enumerate(bounds)
+        }
+    )
+    return {
+        "min": min_price,
+        "max": max_price,
+        "histogram": [
+            {"from": lower, "to": upper, "count": counts[f"bucket_{number}"]}
+            for number, (lower, upper) in enumerate(bounds)
+        ],
+    }
+
+
+def get_rating_expression(reviews_count: Combinable, rating_sum: Combinable) -> Round:
+    """Get a database expression for the average rating from the review counters."""
+    average = Cast(rating_sum, FloatField()) / NullIf(reviews_count, 0)
+    return Round(Coalesce(average, 0.0), 1)
+
+
+def change_product_rating(product_id, rate, count=1) -> None:
+    """
+    Atomically add reviews with the given total rate to the rating counters
+    of a product and update its rating. Negative values remove reviews.
+    """
+    reviews_count = F("reviews_count") + count
+    rating_sum = F("rating_sum") + rate
+    Product.objects.filter(pk=product_id).update(
+        reviews_count=reviews_count,
+        rating_sum=rating_sum,
+        rating=get_rating_expression(reviews_count, rating_sum),
+        updated_at=timezone.now(),
+    )
+
+
+def recalculate_product_rating(products: QuerySet[Product]) -> None:
+    """Recalculate the rating counters of products from their reviews."""
+    reviews = Review.objects.filter(product=OuterRef("pk")).order_by().values("product")
+    products.update(
+        reviews_count=Coalesce(
+            Subquery(reviews.annotate(count=Count("id")).values("count")), 0
+        ),
+        rating_sum=Coalesce(
+            Subquery(reviews.annotate(total=Sum("rate")).values("total")), 0
+        ),
+    )
+    products.update(
+        rating=get_rating_expression(F("reviews_count"), F("rating_sum")),
+        updated_at=timezone.now(),
+    )
+
+
+def decrease_products_count(product_counts: Dict[int, int]) -> List[int]:
+    """
+    Subtract the counts from the stock of products in a single conditional
+    UPDATE. If some products do not have enough stock, nothing is changed and
+    their ids are returned.
+    """
+    if not product_counts:
+        return []
+
+    enough_stock = Q()
+    for product_id, count in product_counts.items():
+        enough_stock |= Q(pk=product_id, count__gte=count)
+    new_count = Case(
+        *(
+            When(pk=product_id, then=F("count") - count)
+            for product_id, count in product_counts.items()
+        ),
+        output_field=PositiveIntegerField(),
+    )
+
+    with transaction.atomic():
+        updated = Product.objects.filter(enough_stock).update(
+            count=new_count, updated_at=timezone.now()
+        )
+        if updated == len(product_counts):
+            sold_out = Product.objects.filter(
+                pk__in=product_counts.keys(), count=0
+            ).exists()
+            transaction.on_commit(get_stock_change_callback(sold_out))
+            return []
+        transaction.set_rollback(True)
+
+    stock = dict(
+        Product.objects.filter(pk__in=product_counts.keys()).values_list("id", "count")
+    )
+    return sorted(
+        product_id
+        for product_id, count in product_counts.items()
+        if stock.get(product_id, 0) < count
+    )
+
+
+def increase_products_count(product_counts: Dict[int, int]) -> None:
+    """Add the counts to the stock of products in a single UPDATE."""
+    if not product_counts:
+        return
+
+    new_count = Case(
+        *(
+            When(pk=product_id, then=F("count") + count)
+            for product_id, count in product_counts.items()
+        ),
+        output_field=PositiveIntegerField(),
+    )
+    products = Product.objects.filter(pk__in=product_counts.keys())
+    back_in_stock = products.filter(count=0).exists()
+    products.update(count=new_count, updated_at=timezone.now())
+    transaction.on_commit(get_stock_change_callback(back_in_stock))
+
+
+def get_stock_change_callback(availability_changed: bool) -> Callable[[], None]:
+    """
+    Get the function invalidating the cached data after a change of stock.
+    Checkouts change the stock all the time, so the cached catalog data is
+    only invalidated when products run out or are back in stock, which
+    changes the filtered lists and their counts. Otherwise the cached lists
+    show the stock counts of up to their lifetime ago, while the product
+    and catalog ETags still change with the stock.
+    """
+    if availability_changed:
+        return catalog_cache.bump_catalog_version
+    return catalog_cache.bump_stock_version
+
+
+def get_basket_items(request) -> Dict[int, int]:
+    """Get the counts of products in the user's shopping basket by product id."""
+    basket = get_basket(request)
+    return basket.get_items() if basket is not None else {}
 
 
 def get_basket_contents(request) -> QuerySet:
     """Get the contents of the user's shopping basket."""
-    basket = request.session.get("basket")
-    if basket:
-        queryset = Product.objects.filter(
-            id__in=(int(product_id) for product_id in basket.keys())
-        )
+    items = get_basket_items(request)
+    if items:
+        queryset = get_product_card_queryset().filter(id__in=items.keys())
 
         for product in queryset:
-            product.count = basket[str(product.id)]["count"]
+            product.count = items[product.id]
 
         return queryset
     return Product.objects.none()
 
 
-def add_to_basket(request) -> QuerySet:
+def add_to_basket(request, product_id: int, count: int) -> QuerySet:
     """Add a product to the user's shopping basket."""
-    product_id = str(request.data.get("id"))
-    count = request.data.get("count", 1)
-
-    if "basket" not in request.session:
-        request.session["basket"] = {}
-    basket = request.session["basket"]
-    if product_id in basket:
-        basket[product_id]["count"] += count
-    else:
-        basket[product_id] = {"count": count}
+    if not Product.objects.filter(pk=product_id).exists():
+        raise Http404
 
-    request.session.modified = True
+    get_basket(request, create=True).add(product_id, count)
 
     return get_basket_contents(request=request)
 
 
-def remove_from_basket(request) -> QuerySet:
+def remove_from_basket(request, product_id: int, count: int) -> QuerySet:
     """Remove a product from the user's shopping basket."""
-    product_id = str(request.data.get("id"))
-    count = request.data.get("count", 1)
-
-    if "basket" in request.session:
-        basket = request.session["basket"]
-        if product_id in basket:
-            if count < basket[product_id]["count"]:
-                basket[product_id]["count"] -= count
-            else:
-                del basket[product_id]
-            request.session.modified = True
+    basket = get_basket(request)
+    if basket is not None:
+        basket.remove(product_id, count)
+
+    return get_basket_contents(request=request)
+
+
+def apply_basket_operations(request, operations) -> QuerySet:
+    """Apply a list of changes to the user's shopping basket together."""
+    get_basket(request, create=True).apply(operations)
 
     return get_basket_contents(request=request)
 
 
 def delete_basket(request) -> None:
     """Delete the user's shopping basket."""
-    del request.session["basket"]
-    request.session.modified = True
+    basket = get_basket(request)
+    if basket is not None:
+        basket.clear()
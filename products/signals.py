@@ -0,0 +1,149 @@
+from django.contrib.auth.signals import user_logged_in
+from django.db import connections
+from django.db.models import signals
+from django.dispatch import receiver
+
+from products import models, services
+from products.baskets import merge_session_basket
+from products.cache import bump_catalog_version
+from products.categories import invalidate_category_tree
+from products.search import create_search_index, is_search_index_available
+
+
+@receiver(signals.post_save, sender=models.ProductSale)
+@receiver(signals.post_delete, sender=models.ProductSale)
+def update_product_effective_price(sender, instance, **kwargs) -> None:
+    """Update the effective price of the product when its sale changes."""
+    services.refresh_effective_price(
+        models.Product.objects.filter(pk=instance.product_id)
+    )
+
+
+@receiver(signals.post_save, sender=models.Review)
+def add_review_to_product_rating(sender, instance, created, **kwargs) -> None:
+    """Update the rating counters of the product when a review is saved."""
+    if created:
+        services.change_product_rating(product_id=instance.product_id, rate=instance.rate)
+    else:
+        services.recalculate_product_rating(
+            models.Product.objects.filter(pk=instance.product_id)
+        )
+
+
+@receiver(signals.post_delete, sender=models.Review)
+def remove_review_from_product_rating(sender, instance, **kwargs) -> None:
+    """Update the rating counters of the product when a review is deleted."""
+    services.change_product_rating(
+        product_id=instance.product_id, rate=-instance.rate, count=-1
+    )
+
+
+@receiver(signals.post_save, sender=models.ProductImage)
+@receiver(signals.post_delete, sender=models.ProductImage)
+def touch_product_of_image(sender, instance, **kwargs) -> None:
+    """Mark the product as changed when its images change."""
+    services.touch_products(models.Product.objects.filter(pk=instance.product_id))
+
+
+@receiver(signals.post_save, sender=models.Tag)
+@receiver(signals.pre_delete, sender=models.Tag)
+def touch_products_of_tag(sender, instance, **kwargs) -> None:
+    """Mark the products with the tag as changed when the tag changes."""
+    services.touch_products(models.Product.objects.filter(tags=instance))
+
+
+@receiver(signals.post_save, sender=models.Specification)
+@receiver(signals.pre_delete, sender=models.Specification)
+def touch_products_of_specification(sender, instance, **kwargs) -> None:
+    """Mark the products with the specification as changed when it changes."""
+    services.touch_products(models.Product.objects.filter(specifications=instance))
+
+
+@receiver(signals.m2m_changed, sender=models.Product.tags.through)
+@receiver(signals.m2m_changed, sender=models.Product.specifications.through)
+def touch_products_on_relation_change(
+    sender, instance, action, reverse, pk_set, **kwargs
+) -> None:
+    """Mark the products as changed when their tags or specifications change."""
+    if action not in ("post_add", "post_remove", "pre_clear"):
+        return
+    if not reverse:
+        services.touch_products(models.Product.objects.filter(pk=instance.pk))
+    elif pk_set is not None:
+        services.touch_products(models.Product.objects.filter(pk__in=pk_set))
+    else:
+        services.touch_products(
+            models.Product.objects.filter(pk__in=instance.products.values("pk"))
+        )
+
+
+@receiver(signals.post_save, sender=models.Product)
+@receiver(signals.post_delete, sender=models.Product)
+@receiver(signals.post_save, sender=models.ProductImage)
+@receiver(signals.post_delete, sender=models.ProductImage)
+@receiver(signals.post_save, sender=models.ProductSale)
+@receiver(signals.post_delete, sender=models.ProductSale)
+@receiver(signals.post_save, sender=models.Tag)
+@receiver(signals.post_delete, sender=models.Tag)
+@receiver(signals.post_save, sender=models.Specification)
+@receiver(signals.post_delete, sender=models.Specification)
+@receiver(signals.post_save, sender=models.Category)
+@receiver(signals.post_delete, sender=models.Category)
+@receiver(signals.post_save, sender=models.CategoryImage)
+@receiver(signals.post_delete, sender=models.CategoryImage)
+@receiver(signals.post_save, sender=models.Review)
+@receiver(signals.post_delete, sender=models.Review)
+def invalidate_catalog_cache(sender, **kwargs) -> None:
+    """Invalidate the cached catalog data when the catalog changes."""
+    bump_catalog_version()
+
+
+@receiver(signals.post_save, sender=models.Product)
+def add_product_to_banner_pool(sender, created, **kwargs) -> None:
+    """Invalidate the banner pool when a product is added."""
+    if created:
+        services.banner_pool_cache.invalidate()
+
+
+@receiver(signals.post_delete, sender=models.Product)
+def remove_product_from_banner_pool(sender, **kwargs) -> None:
+    """Invalidate the banner pool when a product is deleted."""
+    services.banner_pool_cache.invalidate()
+
+
+@receiver(signals.m2m_changed, sender=models.Product.tags.through)
+@receiver(signals.m2m_changed, sender=models.Product.specifications.through)
+def invalidate_catalog_cache_on_relation_change(sender, action, **kwargs) -> None:
+    """Invalidate the cached catalog data when product tags or specifications change."""
+    if action in ("post_add", "post_remove", "post_clear"):
+        bump_catalog_version()
+
+
+@receiver(signals.pre_delete, sender=models.Category)
+def detach_subcategories(sender, instance, **kwargs) -> None:
+    """Move the subcategories of a deleted category to the root with their paths."""
+    for subcategory in instance.subcategory.all():
+        subcategory.category = None
+        subcategory.save()
+
+
+@receiver(signals.post_save, sender=models.Category)
+@receiver(signals.post_delete, sender=models.Category)
+@receiver(signals.post_save, sender=models.CategoryImage)
+@receiver(signals.post_delete, sender=models.CategoryImage)
+def invalidate_category_tree_cache(sender, **kwargs) -> None:
+    """Invalidate the cached category tree when categories or their images change."""
+    invalidate_category_tree()
+
+
+@receiver(user_logged_in)
+def merge_basket_on_login(sender, request, user, **kwargs) -> None:
+    """Move the products of the anonymous basket into the basket of the user."""
+    if request is not None:
+        merge_session_basket(request, user)
+
+
+def restore_search_index(sender, using, **kwargs) -> None:
+    """Recreate the search index triggers dropped by table rebuilds in migrations."""
+    if is_search_index_available(using):
+        create_search_index(connections[using])
@@ -1,3 +1,851 @@
-from django.test import TestCase
+import json
+import threading
+from base64 import urlsafe_b64encode
+from datetime import timedelta
+from io import StringIO
+from tempfile import TemporaryDirectory
+from typing import Callable, List
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.http import QueryDict
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from config.middleware import PRIMARY_COOKIE
+from config.routers import ReplicaRouter, primary_pinning
+from products import baskets, models, services
+from products.baskets import CacheBasketStore, DatabaseBasketStore
+from products.cache import make_catalog_cache_key
+from products.checks import check_basket_store_cache
+from products.filters import ProductFilter
+from products.models import Category, Product, ProductImage, Specification, Tag
+
+REVIEW_DATA = {"author": "Author", "email": "author@example.com", "text": "Text"}
+
+
+def create_product(**fields) -> Product:
+    """Create a product with default values for the fields that are not given."""
+    return Product.objects.create(
+        **{"title": "Product", "price": 100, "count": 10, **fields}
+    )
+
+
+def run_in_threads(target: Callable[[], None], count: int) -> List[Exception]:
+    """
+    Run the function in parallel threads, each with its own database
+    connection, and return the errors raised by them.
+    """
+    barrier = threading.Barrier(count)
+    errors = []
+
+    def run() -> None:
+        try:
+            barrier.wait()
+            target()
+        except Exception as error:
+            errors.append(error)
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=run) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return errors
+
+
+class BasketViewTest(TestCase):
+    """Tests for adding products to the basket and removing them."""
+
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.product = create_product()
+        self.url = reverse("products:basket")
+
+    def get_counts(self) -> dict:
+        """Get the counts of products in the basket by product id."""
+        return {item["id"]: item["count"] for item in self.client.get(self.url).json()}
+
+    def test_add_and_remove(self) -> None:
+        """Products are added and removed by the given counts."""
+        self.client.post(self.url, {"id": self.product.pk, "count": 3}, format="json")
+        self.client.post(self.url, {"id": self.product.pk}, format="json")
+        self.assertEqual(self.get_counts(), {self.product.pk: 4})
+
+        response = self.client.delete(
+            self.url, {"id": self.product.pk, "count": 3}, format="json"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.get_counts(), {self.product.pk: 1})
+
+    def test_invalid_count(self) -> None:
+        """Negative and non-numeric counts are rejected and change nothing."""
+        self.client.post(self.url, {"id": self.product.pk, "count": 2}, format="json")
+        other_product = create_product()
+
+        for product in (self.product, other_product):
+            for count in (-5, "x"):
+                for method in (self.client.post, self.client.delete):
+                    response = method(
+                        self.url, {"id": product.pk, "count": count}, format="json"
+                    )
+                    self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.get_counts(), {self.product.pk: 2})
+
+    def test_unknown_product(self) -> None:
+        """Adding a product that does not exist responds with 404."""
+        response = self.client.post(self.url, {"id": 0}, format="json")
+        self.assertEqual(response.status_code, 404)
+
+
+class BasketBatchViewTest(TestCase):
+    """Tests for applying several basket changes at once."""
+
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.products = [create_product() for _ in range(3)]
+        self.url = reverse("products:basket_batch")
+
+    def post(self, *operations: dict):
+        """Apply the operations to the basket in one request."""
+        return self.client.post(self.url, {"operations": operations}, format="json")
+
+    def get_counts(self) -> dict:
+        """Get the counts of products in the basket by product id."""
+        response = self.client.get(reverse("products:basket"))
+        return {item["id"]: item["count"] for item in response.json()}
+
+    def test_mixed_operations(self) -> None:
+        """Additions, removals and counts are applied in order."""
+        first, second, third = (product.pk for product in self.products)
+        self.post({"id": first, "count": 5}, {"id": second}, {"id": third})
+
+        response = self.post(
+            {"action": "add", "id": first, "count": 2},
+            {"action": "remove", "id": first, "count": 3},
+            {"action": "set", "id": second, "count": 4},
+            {"action": "set", "id": third, "count": 0},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            {item["id"]: item["count"] for item in response.json()},
+            {first: 4, second: 4},
+        )
+        self.assertEqual(self.get_counts(), {first: 4, second: 4})
+
+    def test_invalid_operation(self) -> None:
+        """No operation is applied if one of them is invalid."""
+        product_id = self.products[0].pk
+        self.post({"id": product_id, "count": 2})
+
+        for invalid in ({"id": 0}, {"id": product_id, "count": -1}, {"action": "x"}):
+            with self.subTest(invalid):
+                response = self.post(
+                    {"action": "set", "id": product_id, "count": 7},
+                    {"action": "add", **invalid},
+                )
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(self.get_counts(), {product_id: 2})
+
+    def test_missing_products(self) -> None:
+        """Products that are not added do not need to exist, like for removals."""
+        response = self.post(
+            {"action": "remove", "id": 0, "count": 1},
+            {"action": "set", "id": 0, "count": 0},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), [])
+
+    def test_user_and_session_baskets(self) -> None:
+        """Anonymous users change the session basket and users their own basket."""
+        product_id = self.products[0].pk
+        self.post({"id": product_id, "count": 1})
+        session_basket_id = self.client.session[baskets.BASKET_SESSION_KEY]
+
+        user = User.objects.create_user(username="user")
+        self.client.force_authenticate(user)
+        self.post({"id": product_id, "count": 3})
+
+        store_class = baskets.get_basket_store_class()
+        self.assertEqual(store_class(session_basket_id).get_items(), {product_id: 1})
+        self.assertEqual(
+            store_class(baskets.get_user_basket_id(user)).get_items(), {product_id: 3}
+        )
+        self.assertEqual(self.get_counts(), {product_id: 3})
+
+
+class BasketStoreConcurrencyTest(TransactionTestCase):
+    """Tests for parallel changes of the same basket."""
+
+    def setUp(self) -> None:
+        self.product = create_product()
+
+    def assert_parallel_adds_kept(self, store_class: type) -> None:
+        """Check that parallel additions to a basket of the store are all kept."""
+        threads = 8
+        errors = run_in_threads(
+            lambda: store_class("parallel").add(self.product.pk, 1), threads
+        )
+        self.assertEqual(errors, [])
+        self.assertEqual(store_class("parallel").get_items(), {self.product.pk: threads})
+
+    def test_database_store(self) -> None:
+        """The database store applies every parallel addition."""
+        self.assert_parallel_adds_kept(DatabaseBasketStore)
+
+    def test_cache_store(self) -> None:
+        """The cache store applies every parallel addition."""
+        self.assert_parallel_adds_kept(CacheBasketStore)
+
+
+class BasketStoreTest(TestCase):
+    """Tests for the expiry of baskets and the configuration of their stores."""
+
+    def setUp(self) -> None:
+        self.product = create_product()
+
+    def test_clear_expired(self) -> None:
+        """Anonymous baskets are removed once they have not changed for a session."""
+        for basket_id in ("session:old", "session:new", "user:1"):
+            DatabaseBasketStore(basket_id).add(self.product.pk, 1)
+        models.BasketItem.objects.exclude(basket_id="session:new").update(
+            updated_at=timezone.now() - timedelta(days=30)
+        )
+
+        call_command("clear_expired_baskets", stdout=StringIO())
+        self.assertEqual(
+            set(models.BasketItem.objects.values_list("basket_id", flat=True)),
+            {"session:new", "user:1"},
+        )
+
+    def test_cache_store_with_file_cache(self) -> None:
+        """The cache store is refused with the file-based cache."""
+        with self.settings(
+            BASKET_STORE="products.baskets.CacheBasketStore",
+            CACHES={
+                "default": {
+                    "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+                    "LOCATION": "unused",
+                }
+            },
+        ):
+            errors = check_basket_store_cache(None)
+        self.assertEqual([error.id for error in errors], ["products.E001"])
+        self.assertEqual(check_basket_store_cache(None), [])
+
+    def test_abstract_store(self) -> None:
+        """Basket stores implement every abstract method."""
+        with self.assertRaises(TypeError):
+            baskets.BasketStore("abstract")
+
+
+class CatalogKeysetPaginationTest(TestCase):
+    """Tests for the keyset pagination of the catalog."""
+
+    def setUp(self) -> None:
+        # Equal prices make the pages depend on the id as the tie-breaker.
+        self.products = [create_product(price=price) for price in (5, 3, 3, 3, 1, 4, 2)]
+        self.url = reverse("products:catalog")
+
+    def get_page(self, cursor: str, **params):
+        """Get a catalog page sorted by increasing price by cursor."""
+        return self.client.get(
+            self.url,
+            {"sort": "price", "sortType": "inc", "limit": 3, "cursor": cursor, **params},
+        )
+
+    def test_pages(self) -> None:
+        """The pages cover every product once, in order, and end without a cursor."""
+        ids, cursor, pages = [], "", 0
+        while cursor is not None:
+            data = self.get_page(cursor).json()
+            pages += 1
+            self.assertEqual(data["currentPage"], pages)
+            self.assertEqual(data["lastPage"], 3)
+            ids += [item["id"] for item in data["items"]]
+            cursor = data["nextCursor"]
+
+        expected = sorted(self.products, key=lambda product: (product.price, product.pk))
+        self.assertEqual(ids, [product.pk for product in expected])
+
+    def test_invalid_cursor(self) -> None:
+        """Malformed cursors respond with 404."""
+        valid = {"value": "3", "id": self.products[1].pk, "page": 2, "total": 7}
+        cursors = ["!!!", "e30=", urlsafe_b64encode(b"[1]").decode()] + [
+            urlsafe_b64encode(json.dumps({**valid, **change}).encode()).decode()
+            for change in ({"value": [1]}, {"value": "abc"}, {"id": "1"}, {"page": 0})
+        ]
+        for cursor in cursors:
+            for sort in ("price", "date"):
+                with self.subTest(cursor=cursor, sort=sort):
+                    response = self.get_page(cursor, sort=sort)
+                    self.assertEqual(response.status_code, 404)
+
+
+class ProductConditionalGetTest(TestCase):
+    """Tests for the Last-Modified of product details."""
+
+    def setUp(self) -> None:
+        self.product = create_product()
+        self.tag = Tag.objects.create(name="Tag")
+        self.specification = Specification.objects.create(name="Size", value="1")
+        self.product.tags.add(self.tag)
+        self.product.specifications.add(self.specification)
+        self.url = reverse("products:product-detail", args=(self.product.pk,))
+
+    def assert_modified_by(self, change: Callable[[], None]) -> None:
+        """Check that the change makes a conditional request return the product."""
+        Product.objects.filter(pk=self.product.pk).update(
+            updated_at=timezone.now() - timedelta(days=1)
+        )
+        last_modified = self.client.get(self.url)["Last-Modified"]
+        response = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+        change()
+        response = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 200)
+
+    def test_related_changes(self) -> None:
+        """Changes of the images, tags and specifications modify the product."""
+        other_tag = Tag.objects.create(name="Other")
+        changes = {
+            "add image": lambda: ProductImage.objects.create(
+                product=self.product, alt="image"
+            ),
+            "delete image": lambda: self.product.images.first().delete(),
+            "rename tag": lambda: Tag.objects.filter(pk=self.tag.pk).first().save(),
+            "add tag": lambda: self.product.tags.add(other_tag),
+            "remove product from tag": lambda: other_tag.products.clear(),
+            "change specification": lambda: self.specification.save(),
+            "delete specification": lambda: self.specification.delete(),
+        }
+        for name, change in changes.items():
+            with self.subTest(name):
+                self.assert_modified_by(change)
+
+
+class CatalogInvalidationTest(TestCase):
+    """Tests for invalidating the cached catalog responses on catalog changes."""
+
+    def setUp(self) -> None:
+        self.category = Category.objects.create(title="Category")
+        self.tag = Tag.objects.create(name="Tag")
+        self.product = create_product(category=self.category)
+        self.product.tags.add(self.tag)
+        self.catalog_url = reverse("products:catalog")
+        self.popular_url = reverse("products:popular")
+
+    def assert_invalidated_by(self, change: Callable[[], None]) -> None:
+        """Check that the change invalidates the catalog ETag and cached responses."""
+        etag = self.client.get(self.catalog_url)["ETag"]
+        self.client.get(self.popular_url)
+        self.assertEqual(self.client.get(self.popular_url)["X-Cache"], "HIT")
+        response = self.client.get(self.catalog_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        change()
+        response = self.client.get(self.catalog_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get(self.popular_url)["X-Cache"], "MISS")
+
+    def test_changes(self) -> None:
+        """Saving and deleting products, tags, categories and sales invalidate them."""
+        sale = models.ProductSale(
+            product=self.product, salePrice=50, dateFrom="01-01", dateTo="12-31"
+        )
+        other_tag = Tag.objects.create(name="Other")
+        changes = {
+            "save product": lambda: self.product.save(),
+            "create product": lambda: create_product(title="New"),
+            "save tag": lambda: self.tag.save(),
+            "save category": lambda: self.category.save(),
+            "create sale": lambda: sale.save(),
+            "delete sale": lambda: models.ProductSale.objects.get(pk=sale.pk).delete(),
+            "add tag": lambda: self.product.tags.add(other_tag),
+            "remove tag": lambda: self.product.tags.remove(other_tag),
+            "clear tags": lambda: self.product.tags.clear(),
+            "delete tag": lambda: other_tag.delete(),
+            "delete category": lambda: self.category.delete(),
+            "delete product": lambda: self.product.delete(),
+        }
+        for name, change in changes.items():
+            with self.subTest(name):
+                self.assert_invalidated_by(change)
+
+
+class ProductFieldsTest(TestCase):
+    """Tests for the fields of products in the API."""
+
+    def setUp(self) -> None:
+        self.product = create_product()
+
+    def test_reviews_count(self) -> None:
+        """Product cards show the number of reviews instead of their ids."""
+        for rate in (4, 5):
+            self.product.reviews.create(
+                author="Author", email="a@b.c", text="", rate=rate
+            )
+        item = self.client.get(reverse("products:catalog")).json()["items"][0]
+        self.assertEqual(item["reviews"], 2)
+
+    def test_public_fields(self) -> None:
+        """Only the public fields are shown, without the internal counters."""
+        internal_fields = {"effective_price", "rating_sum", "updated_at"}
+        item = self.client.get(reverse("products:catalog")).json()["items"][0]
+        self.assertFalse(internal_fields.intersection(item))
+        self.assertNotIn("reviews_count", item)
+
+        url = reverse("products:product-detail", args=(self.product.pk,))
+        detail = self.client.get(url).json()
+        self.assertFalse(internal_fields.intersection(detail))
+        self.assertIn("fullDescription", detail)
+        self.assertIn("reviews_count", detail)
+
+
+class ReviewApiViewTest(TestCase):
+    """Tests for creating product reviews."""
+
+    def test_rating(self) -> None:
+        """The created review is returned with the rating shown in the product."""
+        product = create_product()
+        url = reverse("products:review", args=(product.pk,))
+        for rate in (4, 5):
+            response = self.client.post(url, {**REVIEW_DATA, "rate": rate})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()["review"]["rate"], 5)
+
+        detail = self.client.get(reverse("products:product-detail", args=(product.pk,)))
+        self.assertEqual(response.json()["rating"], "4.5")
+        self.assertEqual(response.json()["rating"], detail.json()["rating"])
+        self.assertEqual(response.json()["reviews_count"], 2)
+
+
+class ReviewConcurrencyTest(TransactionTestCase):
+    """Tests for the review counters of a product under parallel reviews."""
+
+    def test_parallel_reviews(self) -> None:
+        """Parallel reviews all count in the review counters and the rating."""
+        product = create_product()
+        url = reverse("products:review", args=(product.pk,))
+
+        def review() -> None:
+            client = APIClient()
+            for rate in (3, 5):
+                response = client.post(url, {**REVIEW_DATA, "rate": rate}, format="json")
+                if response.status_code != 201:
+                    raise AssertionError(response.content)
+
+        threads = 8
+        self.assertEqual(run_in_threads(review, threads), [])
+        product.refresh_from_db()
+        self.assertEqual(product.reviews_count, threads * 2)
+        self.assertEqual(product.rating_sum, threads * 8)
+        self.assertEqual(product.rating, 4)
+
+
+class CatalogSearchTest(TestCase):
+    """Tests for searching the catalog by name."""
+
+    def test_relevance(self) -> None:
+        """Products matching in the title come before those matching elsewhere."""
+        description_match = create_product(title="Case", description="Fits a phone")
+        title_match = create_product(title="Phone")
+        create_product(title="Lamp")
+
+        response = self.client.get(
+            reverse("products:catalog"), {"filter[name]": "phon", "sort": "relevance"}
+        )
+        ids = [item["id"] for item in response.json()["items"]]
+        self.assertEqual(ids, [title_match.pk, description_match.pk])
+
+
+class CatalogCountCacheTest(TestCase):
+    """Tests for caching the number of catalog products matching the filters."""
+
+    def test_invalid_filter(self) -> None:
+        """The count of invalid filters is not cached and all products are listed."""
+        create_product(price=5)
+        create_product(price=50)
+        query_params = QueryDict("filter[minPrice]=abc")
+        filter_params = services.convert_filters_and_sort_params_product(query_params)
+        cache_key = make_catalog_cache_key(
+            "count", services.get_catalog_filter_params(filter_params)
+        )
+
+        for url in (reverse("products:catalog"), reverse("products:async_catalog")):
+            with self.subTest(url):
+                response = self.client.get(url, query_params)
+                self.assertEqual(len(response.json()["items"]), 2)
+                self.assertIsNone(cache.get(cache_key))
+
+
+class CategoryTreeTest(TestCase):
+    """Tests for moving categories in the tree and filtering the catalog by them."""
+
+    def setUp(self) -> None:
+        self.root = Category.objects.create(title="Root")
+        self.child = Category.objects.create(title="Child", category=self.root)
+        self.grandchild = Category.objects.create(title="Grandchild", category=self.child)
+        self.other = Category.objects.create(title="Other")
+        self.product = create_product(category=self.grandchild)
+
+    def get_ids(self, category) -> List[int]:
+        """Get the ids of the catalog products in the category."""
+        response = self.client.get(reverse("products:catalog"), {"category": category})
+        return [item["id"] for item in response.json()["items"]]
+
+    def test_move(self) -> None:
+        """Moving a category moves its descendants and their products with it."""
+        self.assertEqual(self.get_ids(self.root.pk), [self.product.pk])
+
+        self.child.category = self.other
+        self.child.save()
+
+        self.grandchild.refresh_from_db()
+        self.assertTrue(self.grandchild.path.startswith(self.other.path))
+        self.assertEqual(self.get_ids(self.root.pk), [])
+        self.assertEqual(self.get_ids(self.other.pk), [self.product.pk])
+        self.assertEqual(self.get_ids(self.grandchild.pk), [self.product.pk])
+
+    def test_filter_by_category_ids(self) -> None:
+        """Subtrees are filtered by the category ids of products, without a join."""
+        products = ProductFilter(
+            data={"category": self.root.pk, "sort_by": "date", "sort_type": "dec"},
+            queryset=Product.objects.all(),
+        ).qs
+        self.assertNotIn(Category._meta.db_table, str(products.query))
+        self.assertEqual(list(products), [self.product])
+        self.assertEqual(self.get_ids(self.other.pk + 100), [])
+
+    def test_move_into_own_subtree(self) -> None:
+        """A category cannot be moved under its own descendant."""
+        self.root.category = self.grandchild
+        with self.assertRaises(ValueError):
+            self.root.save()
+
+    def test_max_depth(self) -> None:
+        """Categories are not nested deeper than their paths can store."""
+        # Paths of 255 characters hold 25 ids of 10 digits.
+        parent = self.other
+        for _ in range(24):
+            parent = Category.objects.create(title="Nested", category=parent)
+        with self.assertRaises(ValueError):
+            Category.objects.create(title="Too deep", category=parent)
+
+        # The grandchild would be too deep if the child was moved under the parent
+        # of the deepest category.
+        self.child.category = parent.category
+        with self.assertRaises(ValidationError):
+            self.child.full_clean()
+
+    def test_fractional_category(self) -> None:
+        """Fractional category ids are rejected instead of truncated."""
+        response = self.client.get(
+            reverse("products:catalog"), {"category": f"{self.grandchild.pk}.5"}
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+class AsyncCatalogTest(TestCase):
+    """Tests for filtering the async catalog like the sync one."""
+
+    def setUp(self) -> None:
+        self.category = Category.objects.create(title="Category")
+        self.subcategory = Category.objects.create(title="Sub", category=self.category)
+        self.tag = Tag.objects.create(name="Tag")
+        self.cheap = create_product(price=5, category=self.subcategory)
+        self.expensive = create_product(price=500, category=self.category)
+        self.uncategorized = create_product(price=50)
+        self.cheap.tags.add(self.tag)
+
+    def get_ids(self, url: str, params: dict) -> List[int]:
+        """Get the ids of the catalog products matching the filters."""
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return sorted(item["id"] for item in response.json()["items"])
+
+    def test_filters(self) -> None:
+        """The async catalog filters by tags, category and price like the sync one."""
+        filters = {
+            "tags": ({"tags[]": self.tag.pk}, [self.cheap.pk]),
+            "category": (
+                {"category": self.category.pk},
+                [self.cheap.pk, self.expensive.pk],
+            ),
+            "price": (
+                {"filter[minPrice]": 10, "filter[maxPrice]": 1000},
+                [self.expensive.pk, self.uncategorized.pk],
+            ),
+            "all": (
+                {"tags[]": self.tag.pk, "category": self.category.pk, "facets": 1},
+                [self.cheap.pk],
+            ),
+        }
+        for name, (params, expected) in filters.items():
+            for url in (reverse("products:catalog"), reverse("products:async_catalog")):
+                with self.subTest(name, url=url):
+                    self.assertEqual(self.get_ids(url, params), sorted(expected))
+
+
+class CatalogQueryPlansTest(TestCase):
+    """Tests for checking the query plans of the catalog filters."""
+
+    def check_query_plans(self, *args: str) -> str:
+        """Run the command and get its output and warnings."""
+        stdout, stderr = StringIO(), StringIO()
+        call_command("check_catalog_query_plans", *args, stdout=stdout, stderr=stderr)
+        return stdout.getvalue() + stderr.getvalue()
+
+    def test_empty_catalog(self) -> None:
+        """The plans are checked without categories and tags to filter by."""
+        output = self.check_query_plans()
+        self.assertNotIn("category=", output)
+        self.assertNotIn("tags", output)
+
+    def test_filters(self) -> None:
+        """Every filter is checked, and sorts only fail the check when requested."""
+        Category.objects.create(title="Category")
+        Tag.objects.create(name="Tag")
+        output = self.check_query_plans("--verbosity", "2")
+        for param in ("category=", "tags", "minPrice", "maxPrice", "phone"):
+            self.assertIn(param, output)
+
+        if connection.vendor == "sqlite":
+            # SQLite sorts the products filtered by tags in a temporary B-tree.
+            with self.assertRaisesMessage(CommandError, "sort without an index"):
+                self.check_query_plans("--fail-on-sorts")
+
+
+class ResponseCacheStatsTest(TestCase):
+    """Tests for showing the response cache hits and misses."""
+
+    def test_local_memory_cache(self) -> None:
+        """The counters are not read from the memory of another process."""
+        with self.assertRaisesMessage(CommandError, "CACHE_BACKEND=file"):
+            call_command("response_cache_stats")
+
+    def test_file_cache(self) -> None:
+        """The counters of the file-based cache are shown per endpoint."""
+        with TemporaryDirectory() as location, self.settings(
+            CACHES={
+                "default": {
+                    "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+                    "LOCATION": location,
+                }
+            }
+        ):
+            for _ in range(3):
+                self.client.get(reverse("products:popular"))
+            stdout = StringIO()
+            call_command("response_cache_stats", stdout=stdout)
+
+        self.assertRegex(stdout.getvalue(), r"popular\s+2\s+1\s+66.7%")
+
+
+class CatalogFacetsTest(TestCase):
+    """Tests for the facets of the catalog filters."""
+
+    def setUp(self) -> None:
+        self.category = Category.objects.create(title="Category")
+        self.tag = Tag.objects.create(name="Tag")
+        self.other_tag = Tag.objects.create(name="Other")
+        for price, tags in (
+            (10, [self.tag]),
+            (20, [self.tag, self.other_tag]),
+            (110, []),
+        ):
+            product = create_product(price=price, category=self.category)
+            product.tags.set(tags)
+        create_product(price=1000)
+
+    def get_facets(self, **params) -> dict:
+        """Get the facets of the catalog filtered by the parameters."""
+        response = self.client.get(reverse("products:catalog"), {"facets": 1, **params})
+        return response.json()["facets"]
+
+    def test_counts(self) -> None:
+        """Tags and categories are counted over the filtered products."""
+        facets = self.get_facets(**{"filter[maxPrice]": 100})
+        self.assertEqual(
+            facets["tags"],
+            [
+                {"id": self.tag.pk, "name": "Tag", "count": 2},
+                {"id": self.other_tag.pk, "name": "Other", "count": 1},
+            ],
+        )
+        self.assertEqual(
+            facets["categories"],
+            [{"id": self.category.pk, "title": "Category", "count": 2}],
+        )
+
+    def test_price_histogram(self) -> None:
+        """The price facet covers the other filters, but not the price filters."""
+        params = {"category": self.category.pk, "filter[maxPrice]": 15}
+        price = self.get_facets(**params)["price"]
+        self.assertEqual((price["min"], price["max"]), (10, 110))
+        self.assertEqual(
+            [bucket["count"] for bucket in price["histogram"]],
+            [1, 1, 0, 0, 0, 0, 0, 0, 0, 1],
+        )
+
+    def test_empty(self) -> None:
+        """Filters without products have empty facets."""
+        other_category = Category.objects.create(title="Other")
+        facets = self.get_facets(category=other_category.pk)
+        self.assertEqual(
+            facets,
+            {
+                "tags": [],
+                "categories": [],
+                "price": {"min": None, "max": None, "histogram": []},
+            },
+        )
+
+
+class BannerTest(TestCase):
+    """Tests for sampling random products as banners."""
+
+    def setUp(self) -> None:
+        self.products = [create_product() for _ in range(8)]
+
+    def get_banner_ids(self) -> List[int]:
+        """Get the ids of random banner products."""
+        return [
+            product.pk for product in services.get_banner_products(Product.objects.all())
+        ]
+
+    def test_sample(self) -> None:
+        """Banners are distinct products, without sorting the products randomly."""
+        with CaptureQueriesContext(connection) as queries:
+            banner_ids = self.get_banner_ids()
+        self.assertEqual(len(banner_ids), services.BANNERS_COUNT)
+        self.assertEqual(len(set(banner_ids)), len(banner_ids))
+        self.assertTrue(set(banner_ids) <= {product.pk for product in self.products})
+        for query in queries:
+            self.assertNotIn("RANDOM", query["sql"].upper())
+
+    def test_pool_changes(self) -> None:
+        """Added products join the pool and deleted ones leave it."""
+        for product in self.products[1:]:
+            product.delete()
+        self.assertEqual(self.get_banner_ids(), [self.products[0].pk])
+
+        new_product = create_product()
+        self.assertEqual(
+            sorted(self.get_banner_ids()), [self.products[0].pk, new_product.pk]
+        )
+
+
+class ProductReviewsTest(TestCase):
+    """Tests for the reviews in the product detail and their pages."""
+
+    def setUp(self) -> None:
+        self.product = create_product()
+        for number in range(12):
+            self.product.reviews.create(
+                **{**REVIEW_DATA, "text": f"Review {number}"}, rate=number % 5 + 1
+            )
+        self.latest_texts = [f"Review {number}" for number in reversed(range(12))]
+
+    def get_detail(self) -> dict:
+        """Get the detail of the product."""
+        url = reverse("products:product-detail", args=(self.product.pk,))
+        return self.client.get(url).json()
+
+    def test_latest_reviews(self) -> None:
+        """The detail embeds the latest reviews and counts all of them."""
+        detail = self.get_detail()
+        self.assertEqual(
+            [review["text"] for review in detail["reviews"]],
+            self.latest_texts[: services.LATEST_REVIEWS_COUNT],
+        )
+        self.assertEqual(detail["reviews_count"], 12)
+        self.assertEqual(sum(detail["rating_histogram"].values()), 12)
+
+    def test_query_count(self) -> None:
+        """The detail costs as many queries for any number of reviews."""
+        with CaptureQueriesContext(connection) as queries:
+            self.get_detail()
+        for _ in range(20):
+            self.product.reviews.create(**REVIEW_DATA, rate=5)
+        with self.assertNumQueries(len(queries)):
+            self.get_detail()
+
+    def test_pages(self) -> None:
+        """The reviews are listed in pages from the latest one."""
+        url = reverse("products:review", args=(self.product.pk,))
+        response = self.client.get(url, {"limit": 5}).json()
+        texts = [review["text"] for review in response["items"]]
+        pages = 1
+        while response["next"]:
+            response = self.client.get(response["next"]).json()
+            texts += [review["text"] for review in response["items"]]
+            pages += 1
+        self.assertEqual(pages, 3)
+        self.assertEqual(texts, self.latest_texts)
+
+
+@override_settings(DATABASE_REPLICAS=["replica_1", "replica_2"])
+class ReplicaRouterTest(SimpleTestCase):
+    """Tests for routing the catalog reads to the read replicas."""
+
+    def setUp(self) -> None:
+        self.router = ReplicaRouter()
+        self.enterContext(primary_pinning(False))
+
+    def test_catalog_reads(self) -> None:
+        """Catalog reads go to the replicas and other reads to the primary."""
+        self.assertIn(self.router.db_for_read(Product), settings.DATABASE_REPLICAS)
+        self.assertEqual(self.router.db_for_read(models.BasketItem), "default")
+        self.assertEqual(self.router.db_for_read(User), "default")
+
+    def test_writes(self) -> None:
+        """Writes go to the primary, and so do the reads after them."""
+        self.assertEqual(self.router.db_for_write(Product), "default")
+        self.assertEqual(self.router.db_for_read(Product), "default")
+
+    def test_primary_pinning(self) -> None:
+        """Reads of a pinned block go to the primary."""
+        with primary_pinning(True):
+            self.assertEqual(self.router.db_for_read(Product), "default")
+        self.assertIn(self.router.db_for_read(Product), settings.DATABASE_REPLICAS)
+
+    def test_migrations(self) -> None:
+        """Only the primary is migrated."""
+        self.assertIsNone(self.router.allow_migrate("default", "products"))
+        self.assertFalse(self.router.allow_migrate("replica_1", "products"))
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_no_replicas(self) -> None:
+        """Everything goes to the primary without replicas."""
+        self.assertEqual(self.router.db_for_read(Product), "default")
+
+
+class ReplicaPinningMiddlewareTest(TestCase):
+    """Tests for pinning the clients that write to the primary database."""
+
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.product = create_product()
+        self.url = reverse("products:basket")
+
+    @override_settings(DATABASE_REPLICAS=["replica_1"], DATABASE_REPLICA_LAG=7)
+    def test_pinned_after_write(self) -> None:
+        """A client that writes reads from the primary for the replica lag."""
+        response = self.client.post(self.url, {"id": self.product.pk}, format="json")
+        self.assertEqual(response.cookies[PRIMARY_COOKIE]["max-age"], 7)
+
+    def test_not_pinned_without_replicas(self) -> None:
+        """Clients are not pinned without replicas."""
+        response = self.client.post(self.url, {"id": self.product.pk}, format="json")
+        self.assertNotIn(PRIMARY_COOKIE, response.cookies)
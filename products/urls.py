@@ -1,9 +1,11 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-from products.views import (BasketView, CatalogAPIView, CategoryListView,
-                            ProductSaleListView, ProductViewSet, ReviewApiView,
-                            TagListView)
+from products.async_views import (AsyncBasketView, AsyncCatalogView,
+                                  AsyncProductView, HomeFeedView)
+from products.views import (BasketBatchView, BasketView, CatalogAPIView,
+                            CategoryListView, ProductSaleListView,
+                            ProductViewSet, ReviewApiView, TagListView)
 
 app_name = "products"
 
@@ -22,4 +24,9 @@ urlpatterns = [
     path("tags/", TagListView.as_view(), name="tags"),
     path("categories/", CategoryListView.as_view(), name="categories"),
     path("basket/", BasketView.as_view(), name="basket"),
+    path("basket/batch/", BasketBatchView.as_view(), name="basket_batch"),
+    path("home/", HomeFeedView.as_view(), name="home"),
+    path("async/catalog/", AsyncCatalogView.as_view(), name="async_catalog"),
+    path("async/products/<int:pk>/", AsyncProductView.as_view(), name="async_product"),
+    path("async/basket/", AsyncBasketView.as_view(), name="async_basket"),
 ]
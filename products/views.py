@@ -1,13 +1,30 @@
-from django.db.models import Count
+from typing import Optional
+
+from django.db import transaction
 from django.db.models.query import QuerySet
+from django.shortcuts import get_object_or_404
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
 from rest_framework import generics, status, viewsets
 from rest_framework.decorators import action
 from rest_framework.response import Response
 
-from products import serializers, services
+from products import paginations, serializers, services
+from products.baskets import ADD, REMOVE, BasketOperation
+from products.cache import cache_response
+from products.categories import get_category_tree
 from products.filters import ProductFilter
 from products.models import Category, Product, ProductSale, Review, Tag
-from products.paginations import ProductPagination
+
+# Lifetimes of the cached responses in seconds. The responses are also
+# invalidated by every change of the catalog, so the lifetimes only limit how
+# long the time-dependent data, such as the random banners, stays the same.
+POPULAR_CACHE_TIMEOUT = 60 * 10
+LIMITED_CACHE_TIMEOUT = 60 * 10
+BANNERS_CACHE_TIMEOUT = 30
+SALES_CACHE_TIMEOUT = 60 * 5
+TAGS_CACHE_TIMEOUT = 60 * 60
+CATEGORIES_CACHE_TIMEOUT = 60 * 60
 
 
 class ProductViewSet(viewsets.ReadOnlyModelViewSet):
@@ -17,8 +34,20 @@ class ProductViewSet(viewsets.ReadOnlyModelViewSet):
     """
 
     serializer_class = serializers.ProductShortSerializer
-    queryset = Product.objects.select_related("sale").all().order_by("-date")
+    queryset = services.get_product_card_queryset().order_by("-date")
 
+    def get_queryset(self) -> QuerySet[Product]:
+        """Get the queryset with the prefetch plan matching the current action."""
+        if self.action == "retrieve":
+            return services.get_product_detail_queryset()
+        return super().get_queryset()
+
+    @method_decorator(
+        condition(
+            etag_func=services.get_product_etag,
+            last_modified_func=services.get_product_last_modified,
+        )
+    )
     def retrieve(self, request, *args, **kwargs) -> Response:
         """Retrieve detailed information about a specific product."""
         instance = self.get_object()
@@ -26,15 +55,15 @@ class ProductViewSet(viewsets.ReadOnlyModelViewSet):
         return Response(serializer.data)
 
     @action(detail=False, url_path="popular", methods=["get"])
+    @cache_response("popular", timeout=POPULAR_CACHE_TIMEOUT)
     def popular(self, request) -> Response:
         """Retrieve a list of popular products based on the number of reviews."""
-        queryset = self.queryset.annotate(reviews_count=Count("reviews")).order_by(
-            "-reviews_count"
-        )[:5]
+        queryset = self.queryset.order_by("-reviews_count")[:5]
         serializer = self.get_serializer(queryset, many=True)
         return Response(serializer.data)
 
     @action(detail=False, url_path="limited", methods=["get"])
+    @cache_response("limited", timeout=LIMITED_CACHE_TIMEOUT)
     def limited(self, request) -> Response:
         """Retrieve a list of products with limited availability based on the stock count."""
         queryset = self.queryset.order_by("count")[:5]
@@ -42,10 +71,11 @@ class ProductViewSet(viewsets.ReadOnlyModelViewSet):
         return Response(serializer.data)
 
     @action(detail=False, url_path="banners", methods=["get"])
+    @cache_response("banners", timeout=BANNERS_CACHE_TIMEOUT)
     def banners(self, request) -> Response:
         """Retrieve a list of products to be displayed as banners."""
-        queryset = self.queryset.order_by("?")[:5]
-        serializer = self.get_serializer(queryset, many=True)
+        products = services.get_banner_products(self.queryset)
+        serializer = self.get_serializer(products, many=True)
         return Response(serializer.data)
 
 
@@ -59,51 +89,83 @@ class ProductSaleListView(generics.ListAPIView):
         .order_by("-salePrice")
     )
     serializer_class = serializers.ProductSaleSerializer
-    pagination_class = ProductPagination
+    pagination_class = paginations.ProductPagination
+
+    @cache_response("sales", timeout=SALES_CACHE_TIMEOUT)
+    def list(self, request, *args, **kwargs) -> Response:
+        """List the discounted products."""
+        return super().list(request, *args, **kwargs)
 
 
 class CatalogAPIView(generics.ListAPIView):
     """API for browsing product catalog."""
 
     serializer_class = serializers.ProductShortSerializer
-    pagination_class = ProductPagination
+    pagination_class = paginations.CatalogPagination
     filterset_class = ProductFilter
-    queryset = Product.objects.select_related("sale").all()
+    queryset = services.get_product_card_queryset()
 
     def get_queryset(self) -> QuerySet[Product]:
         """Get the queryset of products based on filtering and sorting parameters."""
-        query_params = services.convert_filters_and_sort_params_product(
+        self.filter_params = services.convert_filters_and_sort_params_product(
             query_params=self.request.GET
         )
-        filterset = self.filterset_class(data=query_params, queryset=self.queryset)
+        return services.filter_catalog(self.queryset, self.filter_params)
 
-        if filterset.is_valid():
-            return filterset.qs
-        return self.queryset
+    @method_decorator(condition(etag_func=services.get_catalog_etag))
+    def list(self, request, *args, **kwargs) -> Response:
+        """List the catalog page, with facets for the filters if they are requested."""
+        response = super().list(request, *args, **kwargs)
+        if request.query_params.get("facets") in ("1", "true"):
+            response.data["facets"] = services.get_catalog_facets(self.filter_params)
+        return response
 
+    def get_count_cache_key(self) -> Optional[str]:
+        """Get the cache key for the number of products matching the filters."""
+        return services.get_catalog_count_cache_key(self.filter_params)
 
-class ReviewApiView(generics.CreateAPIView):
-    """API for creating and managing product reviews."""
+
+class ReviewApiView(generics.ListCreateAPIView):
+    """API for listing and creating product reviews."""
 
     serializer_class = serializers.ReviewSerializer
+    pagination_class = paginations.ReviewPagination
+
+    def get_queryset(self) -> QuerySet[Review]:
+        """Get the queryset of reviews of the product."""
+        return Review.objects.filter(product_id=self.kwargs.get("id"))
 
     def perform_create(self, serializer):
         """Performs the creation of a review."""
-        self.product = Product.objects.get(pk=self.kwargs.get("id"))
+        self.product = get_object_or_404(
+            Product.objects.only("id"), pk=self.kwargs.get("id")
+        )
         serializer.save(product=self.product, profile=self.profile)
 
+    @transaction.atomic
     def create(self, request, *args, **kwargs) -> Response:
-        """Handles the creation of a new review."""
+        """
+        Handle the creation of a new review and return it with the updated
+        rating of the product, or with every review of the product if the
+        full query parameter is set.
+        """
         self.profile = None
 
         if request.user.is_authenticated:
             self.profile = request.user.profile
 
-        super().create(request, *args, **kwargs)
-        reviews = Review.objects.filter(product=self.product)
-        services.change_product_rating(product=self.product, reviews=reviews)
-        serializer = serializers.ReviewSerializer(reviews, many=True)
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
+        response = super().create(request, *args, **kwargs)
+
+        if request.query_params.get("full") in ("1", "true"):
+            reviews = Review.objects.filter(product=self.product).order_by("date", "id")
+            serializer = serializers.ReviewSerializer(reviews, many=True)
+            return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+        product = Product.objects.only("rating", "reviews_count").get(pk=self.product.pk)
+        rating = serializers.ProductRatingSerializer(product).data
+        return Response(
+            {"review": response.data, **rating}, status=status.HTTP_201_CREATED
+        )
 
 
 class TagListView(generics.ListAPIView):
@@ -113,6 +175,11 @@ class TagListView(generics.ListAPIView):
     pagination_class = None
     queryset = Tag.objects.all()
 
+    @cache_response("tags", timeout=TAGS_CACHE_TIMEOUT)
+    def list(self, request, *args, **kwargs) -> Response:
+        """List the tags."""
+        return super().list(request, *args, **kwargs)
+
 
 class CategoryListView(generics.ListAPIView):
     """API for listing categories."""
@@ -121,6 +188,11 @@ class CategoryListView(generics.ListAPIView):
     pagination_class = None
     queryset = Category.objects.filter(category__isnull=True)
 
+    @cache_response("categories", timeout=CATEGORIES_CACHE_TIMEOUT)
+    def list(self, request, *args, **kwargs) -> Response:
+        """List the category tree from the memory of the process."""
+        return Response(get_category_tree().data)
+
 
 class BasketView(generics.GenericAPIView):
     """API for managing the user's basket."""
@@ -135,12 +207,45 @@ class BasketView(generics.GenericAPIView):
 
     def post(self, request) -> Response:
         """Add a product to the user's basket."""
-        queryset = services.add_to_basket(request)
+        operation = self.get_operation(request, ADD)
+        queryset = services.add_to_basket(request, operation.product_id, operation.count)
         serializer = self.get_serializer(queryset, many=True)
         return Response(serializer.data, status.HTTP_200_OK)
 
     def delete(self, request) -> Response:
         """Remove a product from the user's basket."""
-        queryset = services.remove_from_basket(request)
+        operation = self.get_operation(request, REMOVE)
+        queryset = services.remove_from_basket(
+            request, operation.product_id, operation.count
+        )
         serializer = self.get_serializer(queryset, many=True)
         return Response(serializer.data, status=status.HTTP_200_OK)
+
+    @staticmethod
+    def get_operation(request, action: str) -> BasketOperation:
+        """Validate the product id and the count of the request as a basket operation."""
+        serializer = serializers.BasketOperationSerializer(
+            data={
+                "action": action,
+                "id": request.data.get("id"),
+                "count": request.data.get("count", 1),
+            }
+        )
+        serializer.is_valid(raise_exception=True)
+        return serializer.validated_data
+
+
+class BasketBatchView(generics.GenericAPIView):
+    """API for applying several changes to the user's basket at once."""
+
+    serializer_class = serializers.BasketBatchSerializer
+
+    def post(self, request) -> Response:
+        """Apply the changes to the user's basket and return its contents."""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        queryset = services.apply_basket_operations(
+            request, serializer.validated_data["operations"]
+        )
+        serializer = serializers.ProductShortSerializer(queryset, many=True)
+        return Response(serializer.data, status=status.HTTP_200_OK)